@@ -0,0 +1,332 @@
+import math
+import random
+import sqlite3
+import threading
+
+import metrics
+from quiz_engine import QUESTIONS_PER_QUIZ, QuizEngine, QuizSession
+
+CREATE_STATS = (
+    '''CREATE TABLE IF NOT EXISTS question_stats (
+        question_id INTEGER PRIMARY KEY REFERENCES questions (id) ON DELETE CASCADE,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0,
+        sum_ability REAL NOT NULL DEFAULT 0,
+        sum_ability_sq REAL NOT NULL DEFAULT 0,
+        sum_ability_correct REAL NOT NULL DEFAULT 0,
+        difficulty REAL,
+        discrimination REAL)''',
+    "CREATE INDEX IF NOT EXISTS idx_question_stats_difficulty ON question_stats (difficulty)",
+)
+RECORD_ANSWER = '''INSERT INTO question_stats (question_id, attempts, correct, sum_ability, sum_ability_sq, sum_ability_correct)
+                   VALUES (?, 1, ?, ?, ?, ?)
+                   ON CONFLICT (question_id) DO UPDATE SET
+                       attempts = attempts + 1,
+                       correct = correct + excluded.correct,
+                       sum_ability = sum_ability + excluded.sum_ability,
+                       sum_ability_sq = sum_ability_sq + excluded.sum_ability_sq,
+                       sum_ability_correct = sum_ability_correct + excluded.sum_ability_correct
+                   RETURNING attempts, correct, sum_ability, sum_ability_sq, sum_ability_correct'''
+UPDATE_ESTIMATES = "UPDATE question_stats SET difficulty = ?, discrimination = ? WHERE question_id = ?"
+SELECT_DIFFICULTIES = '''SELECT q.id, q.difficulty, s.difficulty FROM questions q
+                         LEFT JOIN question_stats s ON s.question_id = q.id'''
+
+# Expected share of correct answers for the bank's 1-3 difficulty levels,
+# used as a prior until a question has real attempts
+LEVEL_PRIOR = {1: 0.8, 2: 0.6, 3: 0.4}
+PRIOR_WEIGHT = 4
+# Difficulty buckets on the logit scale
+BUCKET_WIDTH = 0.25
+DIFFICULTY_RANGE = 4.0
+
+
+def logistic(x):
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+# Rasch-style difficulty: the log-odds of a wrong answer, smoothed towards the
+# question's authored level so new questions start somewhere sensible
+def estimate_difficulty(attempts, correct, level=2):
+    prior = LEVEL_PRIOR.get(level, 0.6)
+    wrong = attempts - correct + PRIOR_WEIGHT * (1 - prior)
+    right = correct + PRIOR_WEIGHT * prior
+    return math.log(wrong / right)
+
+
+# Point-biserial correlation between answering correctly and the learner's
+# ability when they answered; computed from running sums
+def estimate_discrimination(attempts, correct, sum_ability, sum_ability_sq, sum_ability_correct):
+    if correct == 0 or correct == attempts:
+        return None
+    mean = sum_ability / attempts
+    variance = sum_ability_sq / attempts - mean * mean
+    if variance <= 1e-12:
+        return None
+    p = correct / attempts
+    return (sum_ability_correct / correct - mean) / math.sqrt(variance) * math.sqrt(p / (1 - p))
+
+
+# Questions grouped into fixed-width difficulty buckets. Finding a question
+# near a given ability looks at the matching bucket and its neighbours, and
+# moving a question between buckets is a swap-and-pop, so both cost the same
+# for a bank of any size.
+class DifficultyIndex:
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+        count = int(2 * DIFFICULTY_RANGE / BUCKET_WIDTH) + 1
+        self.buckets = [[] for _ in range(count)]
+        self.where = {}  # question id -> (bucket number, position in bucket)
+        self.lock = threading.Lock()
+
+    def bucket_for(self, difficulty):
+        clamped = min(max(difficulty, -DIFFICULTY_RANGE), DIFFICULTY_RANGE)
+        return int(round((clamped + DIFFICULTY_RANGE) / BUCKET_WIDTH))
+
+    def __len__(self):
+        return len(self.where)
+
+    def _remove(self, question_id):
+        number, position = self.where.pop(question_id)
+        bucket = self.buckets[number]
+        last = bucket.pop()
+        if last != question_id:
+            bucket[position] = last
+            self.where[last] = (number, position)
+
+    def place(self, question_id, difficulty):
+        number = self.bucket_for(difficulty)
+        with self.lock:
+            current = self.where.get(question_id)
+            if current is not None:
+                if current[0] == number:
+                    return
+                self._remove(question_id)
+            bucket = self.buckets[number]
+            self.where[question_id] = (number, len(bucket))
+            bucket.append(question_id)
+
+    def discard(self, question_id):
+        with self.lock:
+            if question_id in self.where:
+                self._remove(question_id)
+
+    # Random question from the bucket closest to `ability`, skipping `exclude`
+    def nearest(self, ability, exclude=()):
+        start = self.bucket_for(ability)
+        with self.lock:
+            for distance in range(len(self.buckets)):
+                for number in {start - distance, start + distance}:
+                    if 0 <= number < len(self.buckets):
+                        bucket = self.buckets[number]
+                        candidates = len(bucket)
+                        if not candidates:
+                            continue
+                        # Sample a few times before scanning, so large buckets stay cheap
+                        for _ in range(4):
+                            question_id = bucket[self.rng.randrange(candidates)]
+                            if question_id not in exclude:
+                                return question_id
+                        for question_id in bucket:
+                            if question_id not in exclude:
+                                return question_id
+        return None
+
+
+# Per-question attempt/correct counts and running difficulty and
+# discrimination estimates, persisted in question_stats and mirrored in a
+# DifficultyIndex for selection. As a session listener it only queues each
+# answer; a background thread writes them in batches and retries while the
+# database is locked, so grading never waits on or fails with the database.
+# Answers still queued when the process dies are lost, which only makes the
+# statistics a little less complete.
+class QuestionStats:
+    def __init__(self, repository, rng=None, interval=0.5):
+        self.repository = repository
+        self.index = DifficultyIndex(rng)
+        self.difficulty = {}  # question id -> current estimate
+        # Seconds between retries while the database is locked (doubling)
+        self.interval = interval
+        self._queue = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+    def init_schema(self):
+        with self.repository.transaction() as conn:
+            for statement in CREATE_STATS:
+                conn.execute(statement)
+
+    # Build the in-memory index from the stored estimates (one pass at startup)
+    def load(self):
+        with self.repository.reader() as conn:
+            for question_id, level, difficulty in conn.execute(SELECT_DIFFICULTIES):
+                if difficulty is None:
+                    difficulty = estimate_difficulty(0, 0, level)
+                self.difficulty[question_id] = difficulty
+                self.index.place(question_id, difficulty)
+        return self
+
+    def record(self, question, correct, ability=0.0):
+        return self.record_many([(question, correct, ability)])[-1]
+
+    # (question, correct, ability) answers in one transaction; returns the
+    # new difficulty after each
+    def record_many(self, answers):
+        updated = []
+        with self.repository.transaction() as conn:
+            for question, correct, ability in answers:
+                params = (question.id, int(correct), ability, ability * ability, ability if correct else 0.0)
+                attempts, right, total, total_sq, total_correct = conn.execute(RECORD_ANSWER, params).fetchone()
+                difficulty = estimate_difficulty(attempts, right, question.difficulty)
+                discrimination = estimate_discrimination(attempts, right, total, total_sq, total_correct)
+                conn.execute(UPDATE_ESTIMATES, (difficulty, discrimination, question.id))
+                updated.append((question.id, difficulty))
+        for question_id, difficulty in updated:
+            self.difficulty[question_id] = difficulty
+            self.index.place(question_id, difficulty)
+        return [difficulty for _, difficulty in updated]
+
+    def difficulty_of(self, question):
+        estimate = self.difficulty.get(question.id)
+        return estimate if estimate is not None else estimate_difficulty(0, 0, question.difficulty)
+
+    # QuizSession listener hook: queue every graded answer for the writer
+    def answered(self, session, question, correct):
+        if question.id is None:
+            return
+        with self._lock:
+            self._queue.append((question, correct, getattr(session, "ability", 0.0)))
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name="quiz-stats", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    def _write_batch(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = self._queue[:]
+            if batch:
+                self.record_many(batch)
+                with self._lock:
+                    del self._queue[:len(batch)]
+        return len(batch)
+
+    def _run(self):
+        delay = self.interval
+        while True:
+            with self._lock:
+                if not self._queue and not self._stopping:
+                    self._wake.wait()
+                if self._stopping:
+                    return
+            try:
+                self._write_batch()
+                delay = self.interval
+            except sqlite3.Error:
+                # Locked or busy: keep the answers and back off
+                metrics.count("stats.retry")
+                with self._lock:
+                    if not self._stopping:
+                        self._wake.wait(delay)
+                delay = min(delay * 2, 30.0)
+
+    # Write everything queued now, on the calling thread; False if the
+    # database could not be written
+    def flush(self):
+        try:
+            self._write_batch()
+        except sqlite3.Error:
+            return False
+        return True
+
+    def close(self):
+        with self._lock:
+            self._stopping = True
+            self._wake.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self.flush()
+        with self._lock:
+            # Later answers start a new writer
+            self._stopping = False
+
+    def get(self, question_id):
+        with self.repository.reader() as conn:
+            row = conn.execute('''SELECT attempts, correct, difficulty, discrimination FROM question_stats
+                                  WHERE question_id = ?''', (question_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("attempts", "correct", "difficulty", "discrimination"), row))
+
+
+# A quiz that picks each next question to match the learner's current
+# ability estimate, updated Elo-style after every answer
+class AdaptiveQuizSession(QuizSession):
+    __slots__ = ("ability", "length", "engine")
+
+    def __init__(self, session_id, username, engine, length):
+        super().__init__(session_id, username, [], engine.stats)
+        self.ability = 0.0
+        self.length = length
+        self.engine = engine
+        self._extend()
+
+    @property
+    def total(self):
+        return self.length
+
+    # Later questions depend on earlier answers, so there is no going back or
+    # skipping ahead
+    @property
+    def is_first(self):
+        return True
+
+    @property
+    def is_last(self):
+        return True
+
+    def previous(self):
+        return False
+
+    def next(self):
+        return False
+
+    def _extend(self):
+        if len(self.questions) < self.length:
+            question = self.engine.next_question(self.ability, {q.id for q in self.questions})
+            if question is not None:
+                self.questions.append(question)
+            else:
+                self.length = len(self.questions)
+
+    def submit_index(self, option_index):
+        question = self.questions[self.current_question_index]
+        # Expectation uses the difficulty as it was before this answer is recorded
+        expected = logistic(self.ability - self.engine.stats.difficulty_of(question))
+        correct = super().submit_index(option_index)
+        step = 1.5 / math.sqrt(1 + self.answered)
+        self.ability += step * ((1.0 if correct else 0.0) - expected)
+        self._extend()
+        return correct
+
+
+class AdaptiveQuizEngine(QuizEngine):
+    def __init__(self, bank, stats=None, questions_per_quiz=QUESTIONS_PER_QUIZ, rng=None):
+        super().__init__(questions_per_quiz=questions_per_quiz, rng=rng, bank=bank)
+        self.stats = stats or QuestionStats(bank.repository, rng).load()
+
+    def next_question(self, ability, exclude):
+        question_id = self.stats.index.nearest(ability, exclude)
+        return self.bank.get(question_id) if question_id is not None else None
+
+    def start_session(self, username=None):
+        session = AdaptiveQuizSession(next(self._ids), username, self, self.questions_per_quiz)
+        self.sessions[session.session_id] = session
+        return session
@@ -0,0 +1,74 @@
+import os
+import threading
+
+# Navigation sounds; names without a file on disk are simply silent
+SOUNDS = {
+    "next": "next_sound.wav",
+    "previous": "next_sound.wav",
+    "submit": "next_sound.wav",
+}
+
+
+# Sound effects for the GUI. Only pygame.mixer is initialised, never the rest
+# of pygame, and that happens on a background thread together with decoding
+# the sound files, so neither startup nor the Tk loop waits for it. Decoded
+# sounds are cached and play() hands them to the mixer's own thread. Without
+# pygame or an audio device, or with QUIZ_AUDIO=0, play() does nothing.
+class AudioPlayer:
+    def __init__(self, sounds=SOUNDS, enabled=None):
+        self.sounds = dict(sounds)
+        if enabled is None:
+            enabled = os.environ.get("QUIZ_AUDIO", "1") != "0"
+        self.enabled = enabled
+        self._cache = {}
+        self._mixer = None
+        self._loader = None
+
+    # Initialise the mixer and decode every sound in the background
+    def start(self):
+        if self.enabled and self._loader is None:
+            self._loader = threading.Thread(target=self._load, name="quiz-audio", daemon=True)
+            self._loader.start()
+        return self
+
+    def _load(self):
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        try:
+            import pygame.mixer as mixer
+            mixer.init()
+        except Exception:
+            # No pygame or no audio device: stay silent
+            self.enabled = False
+            return
+        cache = {}
+        decoded = {}
+        for name, path in self.sounds.items():
+            # Several names may share one file; decode it once
+            if path not in decoded:
+                try:
+                    decoded[path] = mixer.Sound(path)
+                except Exception:
+                    decoded[path] = None
+            if decoded[path] is not None:
+                cache[name] = decoded[path]
+        self._mixer = mixer
+        self._cache = cache
+
+    @property
+    def ready(self):
+        return self._mixer is not None
+
+    # Start a sound and return at once; a sound still loading is skipped
+    def play(self, name):
+        sound = self._cache.get(name)
+        if sound is not None:
+            sound.play()
+
+    def close(self):
+        if self._loader is not None:
+            self._loader.join()
+            self._loader = None
+        if self._mixer is not None:
+            self._cache = {}
+            self._mixer.quit()
+            self._mixer = None
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Benchmarks import the app modules from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@contextmanager
+def temp_db():
+    # Fresh database file in a throwaway directory, removed afterwards
+    with tempfile.TemporaryDirectory() as tmp:
+        yield os.path.join(tmp, "bench.db")
+
+
+# Call fn(i) for i in range(n) and return operations per second
+def rate(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    return n / elapsed if elapsed else float("inf")
+
+
+# Mean milliseconds per call of fn() over `repeat` calls
+def mean_ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+# Nearest-rank percentile of an already sorted list; 0.0 when it is empty
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def report(title, results):
+    print(title)
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f"  {name:<{width}}  {value:,.3f}")
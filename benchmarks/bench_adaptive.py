@@ -0,0 +1,73 @@
+# Adaptive question selection on a large bank: building the difficulty
+# index, choosing the next question for an ability estimate, and recording
+# an answer with its updated difficulty/discrimination estimates.
+import argparse
+import random
+import time
+
+from adaptive import AdaptiveQuizEngine, QuestionStats
+from benchmarks._common import report, temp_db
+from benchmarks.bench_question_bank import synthetic_questions
+from database import QuizRepository
+from question_bank import QuestionBank
+
+
+def run(bank_size=100000, n=5000, seed=0):
+    rng = random.Random(seed)
+    results = {}
+    with temp_db() as path:
+        repo = QuizRepository(path)
+        repo.init_schema()
+        bank = QuestionBank(repo, rng)
+        bank.init_schema(seed=())
+        bank.add_questions(synthetic_questions(bank_size, seed))
+        stats = QuestionStats(repo, rng)
+        stats.init_schema()
+
+        start = time.perf_counter()
+        stats.load()
+        results["index build ms"] = (time.perf_counter() - start) * 1000
+
+        abilities = [rng.gauss(0, 1.5) for _ in range(n)]
+        start = time.perf_counter()
+        for ability in abilities:
+            stats.index.nearest(ability, ())
+        results["select us (index only)"] = (time.perf_counter() - start) / n * 1e6
+
+        engine = AdaptiveQuizEngine(bank, stats, rng=rng)
+        start = time.perf_counter()
+        for ability in abilities:
+            engine.next_question(ability, ())
+        results["select us (with row fetch)"] = (time.perf_counter() - start) / n * 1e6
+
+        questions = [bank.get(rng.randint(1, bank_size)) for _ in range(n)]
+        start = time.perf_counter()
+        for question, ability in zip(questions, abilities):
+            stats.record(question, rng.random() < 0.6, ability)
+        results["record answer us"] = (time.perf_counter() - start) / n * 1e6
+
+        start = time.perf_counter()
+        sessions = n // 5
+        for i in range(sessions):
+            session = engine.start_session(f"user{i}")
+            while not session.finished:
+                question = session.current_question
+                session.submit_index(question.answer_index if rng.random() < 0.6 else 0)
+            engine.end_session(session.session_id)
+        # Answers are recorded by a background thread; count their writes too
+        stats.close()
+        results["adaptive sessions/s"] = sessions / (time.perf_counter() - start)
+        repo.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark adaptive question selection")
+    parser.add_argument("--bank-size", type=int, default=100000)
+    parser.add_argument("-n", type=int, default=5000, help="selections and answers to time")
+    args = parser.parse_args(argv)
+    report(f"Adaptive selection ({args.bank_size:,} questions)", run(args.bank_size, args.n))
+
+
+if __name__ == "__main__":
+    main()
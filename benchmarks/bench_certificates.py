@@ -0,0 +1,45 @@
+# Certificates per second: rendering one after another in this process versus
+# the CertificateQueue process pool, normalised per core.
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks._common import report
+from certificates import CertificateQueue, render_certificate, static_page
+
+
+def run(n=200, workers=None):
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        static_page()
+        start = time.perf_counter()
+        for i in range(n):
+            render_certificate(f"student{i:05d}", i % 6, out_dir=out_dir)
+        serial = n / (time.perf_counter() - start)
+        results["serial certificates/s"] = serial
+        results["serial ms per PDF"] = 1000 / serial
+
+        jobs = CertificateQueue(workers, out_dir)
+        # Start the workers before timing so pool start-up is not counted
+        list(jobs.render_many([("warmup", 0, 5, f"_{w}") for w in range(workers)], chunksize=1))
+        start = time.perf_counter()
+        list(jobs.render_many((f"student{i:05d}", i % 6, 5, "_pool") for i in range(n)))
+        pooled = n / (time.perf_counter() - start)
+        jobs.shutdown()
+        results[f"pool certificates/s ({workers} workers)"] = pooled
+        results["pool certificates/s per core"] = pooled / workers
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark certificate rendering")
+    parser.add_argument("-n", type=int, default=200, help="certificates to render")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    report(f"Certificate rendering ({args.n} PDFs)", run(args.n, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Registrations, logins and result inserts per second: the original
+# connect-per-call functions against the pooled QuizRepository. The
+# repository also hashes passwords; here it stores them as given, like the
+# legacy code, so both sides measure database access only.
+# bench_passwords.py measures the hashing cost itself.
+import argparse
+import sqlite3
+
+from benchmarks._common import rate, report, temp_db
+from database import QuizRepository
+
+
+# Stand-in for PasswordHasher that does no hashing
+class PlaintextHasher:
+    def hash(self, password):
+        return password
+
+    def verify(self, password, stored):
+        return password == stored
+
+    def verify_missing(self, password):
+        return False
+
+    def needs_rehash(self, stored):
+        return False
+
+
+# The data-access functions as they were before the repository existed
+def legacy_init_db(path):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
+                        username TEXT PRIMARY KEY,
+                        password TEXT NOT NULL)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS results (
+                        username TEXT,
+                        score INTEGER)''')
+    conn.commit()
+    conn.close()
+
+
+def legacy_register_user(path, username, password):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        return False
+    finally:
+        conn.close()
+
+
+def legacy_verify_user(path, username, password):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
+    user = cursor.fetchone()
+    conn.close()
+    return user is not None
+
+
+def legacy_save_quiz_result(path, username, score):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO results (username, score) VALUES (?, ?)", (username, score))
+    conn.commit()
+    conn.close()
+
+
+def run(n=2000, commit_every=100):
+    results = {}
+    with temp_db() as path:
+        legacy_init_db(path)
+        results["legacy register/s"] = rate(lambda i: legacy_register_user(path, f"user{i:06d}", "secret1"), n)
+        results["legacy login/s"] = rate(lambda i: legacy_verify_user(path, f"user{i:06d}", "secret1"), n)
+        results["legacy result insert/s"] = rate(lambda i: legacy_save_quiz_result(path, f"user{i:06d}", i % 6), n)
+
+    with temp_db() as path:
+        repo = QuizRepository(path, commit_every=commit_every, hasher=PlaintextHasher())
+        repo.init_schema()
+        results["pooled register/s"] = rate(lambda i: repo.register_user(f"user{i:06d}", "secret1"), n)
+        results["pooled login/s"] = rate(lambda i: repo.verify_user(f"user{i:06d}", "secret1"), n)
+        results["pooled result insert/s"] = rate(lambda i: repo.save_quiz_result(f"user{i:06d}", i % 6), n)
+        repo.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SQLite data access")
+    parser.add_argument("-n", type=int, default=2000, help="operations per measurement")
+    parser.add_argument("--commit-every", type=int, default=100, help="result inserts per transaction")
+    args = parser.parse_args(argv)
+    report(f"SQLite data access ({args.n} ops)", run(args.n, args.commit_every))
+
+
+if __name__ == "__main__":
+    main()
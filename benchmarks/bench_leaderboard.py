@@ -0,0 +1,61 @@
+# Leaderboard and statistics queries on a large synthetic results table:
+# the trigger-maintained aggregates against GROUP BY scans of results.
+import argparse
+import random
+import time
+
+from benchmarks._common import mean_ms, report, temp_db
+from database import QuizRepository
+from leaderboard import Leaderboard
+
+CHUNK = 100000
+
+
+def synthetic_results(rows, users, seed=0):
+    rng = random.Random(seed)
+    for _ in range(rows):
+        yield f"user{rng.randrange(users):07d}", rng.randint(0, 5)
+
+
+def run(rows=10000000, users=100000, repeat=20):
+    results = {}
+    with temp_db() as path:
+        repo = QuizRepository(path)
+        repo.init_schema()
+        start = time.perf_counter()
+        batch = []
+        for row in synthetic_results(rows, users):
+            batch.append(row)
+            if len(batch) == CHUNK:
+                repo.save_quiz_results(batch)
+                batch = []
+        if batch:
+            repo.save_quiz_results(batch)
+        results["inserts/s with aggregate triggers"] = rows / (time.perf_counter() - start)
+
+        board = Leaderboard(repo)
+        results["top 10 ms"] = mean_ms(lambda: board.top(10), repeat)
+        results["user stats ms"] = mean_ms(lambda: board.user_stats("user0000042"), repeat)
+        results["histogram ms"] = mean_ms(board.histogram, repeat)
+        results["user history ms"] = mean_ms(lambda: board.history("user0000042"), repeat)
+
+        with repo.reader() as conn:
+            results["scan top 10 ms"] = mean_ms(lambda: conn.execute(
+                "SELECT username, max(score) AS best FROM results GROUP BY username "
+                "ORDER BY best DESC, username LIMIT 10").fetchall(), 1)
+            results["scan histogram ms"] = mean_ms(lambda: conn.execute(
+                "SELECT score, count(*) FROM results GROUP BY score").fetchall(), 1)
+        repo.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark leaderboard queries")
+    parser.add_argument("--rows", type=int, default=10000000, help="synthetic results rows")
+    parser.add_argument("--users", type=int, default=100000, help="distinct usernames")
+    args = parser.parse_args(argv)
+    report(f"Leaderboard ({args.rows:,} results, {args.users:,} users)", run(args.rows, args.users))
+
+
+if __name__ == "__main__":
+    main()
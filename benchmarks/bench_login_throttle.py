@@ -0,0 +1,112 @@
+# A password-guessing attack from several addresses while a class logs in,
+# with and without LoginThrottle. Attackers cycle a short word list over a
+# few account names as fast as they can; students log in once each, with
+# the right password, while the attack runs. Reports how many password
+# checks reached the database and the students' login latency.
+import argparse
+import os
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import percentile, report, temp_db
+from database import QuizRepository
+from login_throttle import LoginThrottle, LoginThrottled
+from metrics import QUANTILES
+from passwords import COST_LEVELS, PasswordHasher
+
+TARGETS = ("admin", "teacher", "root", "student", "test")
+WORDS = [f"password{i}" for i in range(20)]
+
+
+def attack(login, source, attempts):
+    throttled = 0
+    for i in range(attempts):
+        try:
+            login(TARGETS[i % len(TARGETS)], WORDS[i // len(TARGETS) % len(WORDS)], source)
+        except LoginThrottled:
+            throttled += 1
+    return throttled
+
+
+def student(login, username, delay):
+    time.sleep(delay)
+    start = time.perf_counter()
+    # crc32 rather than hash(), so each student keeps its address between runs
+    try:
+        ok = login(username, "secret-password", f"192.168.1.{zlib.crc32(username.encode()) % 250}")
+    except LoginThrottled:
+        return None
+    if not ok:
+        raise RuntimeError(f"login failed for {username}")
+    return time.perf_counter() - start
+
+
+def scenario(repo, throttle, students, attackers, attempts, threads, seed):
+    checks = [0]
+    lock = threading.Lock()
+
+    def check(username, password):
+        with lock:
+            checks[0] += 1
+        return repo.verify_user(username, password)
+
+    if throttle is None:
+        def login(username, password, source):
+            return check(username, password)
+    else:
+        def login(username, password, source):
+            return throttle.verify(check, username, password, source)
+
+    rng = random.Random(seed)
+    names = [f"student{i:04d}" for i in range(students)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        attacks = [pool.submit(attack, login, f"10.0.0.{a}", attempts) for a in range(attackers)]
+        logins = [pool.submit(student, login, name, rng.uniform(0, 0.2)) for name in names]
+        throttled = sum(job.result() for job in attacks)
+        latencies = [job.result() for job in logins]
+    elapsed = time.perf_counter() - start
+    served = sorted(latency for latency in latencies if latency is not None)
+    results = {
+        "password checks": checks[0],
+        "attack attempts/s": attackers * attempts / elapsed,
+        "attack attempts throttled": throttled,
+        "students throttled": len(latencies) - len(served),
+    }
+    for q in QUANTILES:
+        results[f"student login p{int(q * 100)} ms"] = percentile(served, q) * 1000
+    return results
+
+
+def run(students=100, attackers=8, attempts=500, level="fast", threads=None, seed=0):
+    threads = threads or min(32, (os.cpu_count() or 1) + attackers)
+    results = {}
+    with temp_db() as path:
+        # cache_size=0 so every check that gets through pays for the hash
+        repo = QuizRepository(path, pool_size=threads, hasher=PasswordHasher.from_level(level, cache_size=0))
+        repo.init_schema()
+        repo.register_users((f"student{i:04d}", "secret-password") for i in range(students))
+        for mode, throttle in (("unthrottled", None), ("throttled", LoginThrottle())):
+            for metric, value in scenario(repo, throttle, students, attackers, attempts, threads, seed).items():
+                results[f"{mode} {metric}"] = value
+        repo.close()
+    results["password checks avoided"] = results["unthrottled password checks"] - results["throttled password checks"]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark login throttling under a password-guessing attack")
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--attackers", type=int, default=8, help="attacking addresses, one thread each")
+    parser.add_argument("--attempts", type=int, default=500, help="guesses per attacker")
+    parser.add_argument("--password-cost", default="fast", choices=sorted(COST_LEVELS))
+    args = parser.parse_args(argv)
+    results = run(args.students, args.attackers, args.attempts, args.password_cost)
+    report(f"Logins under attack ({args.attackers} x {args.attempts} guesses, {args.students} students)", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Logins per second at each password cost level, from one thread and from a
+# thread pool (hashlib releases the GIL while hashing), to help size servers.
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import report, temp_db
+from database import QuizRepository
+from passwords import COST_LEVELS, PasswordHasher
+
+USERS = 8
+
+
+def run(levels=("fast", "interactive", "moderate", "pbkdf2"), n=40, threads=None):
+    threads = threads or os.cpu_count() or 1
+    results = {}
+    for level in levels:
+        with temp_db() as path:
+            # cache_size=0 so every login pays the full hashing cost
+            repo = QuizRepository(path, pool_size=threads, hasher=PasswordHasher.from_level(level, cache_size=0))
+            repo.init_schema()
+            for i in range(USERS):
+                repo.register_user(f"student{i}", "secret-password")
+
+            start = time.perf_counter()
+            for i in range(n):
+                repo.verify_user(f"student{i % USERS}", "secret-password")
+            results[f"{level} logins/s (1 thread)"] = n / (time.perf_counter() - start)
+
+            with ThreadPoolExecutor(threads) as pool:
+                start = time.perf_counter()
+                list(pool.map(lambda i: repo.verify_user(f"student{i % USERS}", "secret-password"), range(n)))
+                results[f"{level} logins/s ({threads} threads)"] = n / (time.perf_counter() - start)
+
+            cached = PasswordHasher.from_level(level)
+            stored = cached.hash("secret-password")
+            cached.verify("secret-password", stored)
+            start = time.perf_counter()
+            for _ in range(n):
+                cached.verify("secret-password", stored)
+            results[f"{level} cached verifications/s"] = n / (time.perf_counter() - start)
+            repo.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark password verification cost levels")
+    parser.add_argument("--levels", nargs="+", default=["fast", "interactive", "moderate", "pbkdf2"],
+                        choices=sorted(COST_LEVELS))
+    parser.add_argument("-n", type=int, default=40, help="logins per measurement")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args(argv)
+    report("Password verification", run(args.levels, args.n, args.threads))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Time to draw a quiz from the SQLite question bank as the bank grows,
+# next to the old approach of building the whole list and shuffling it, and
+# with the question cache turned off.
+import argparse
+import random
+
+from benchmarks._common import mean_ms, report, temp_db
+from database import QuizRepository
+from question_bank import QuestionBank
+from question_cache import QuestionCache
+from quiz_engine import QUESTIONS, QUESTIONS_PER_QUIZ
+
+TOPICS = ("python", "web", "general")
+
+
+def synthetic_questions(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        template = QUESTIONS[i % len(QUESTIONS)]
+        yield {
+            "question": f"{template['question']} (#{i})",
+            "options": template["options"],
+            "answer": template["answer"],
+            "explanation": template["explanation"],
+            "topic": rng.choice(TOPICS),
+            "difficulty": rng.randint(1, 3),
+        }
+
+
+def legacy_start(bank_size):
+    questions = [dict(q) for q in synthetic_questions(bank_size)]
+    random.shuffle(questions)
+    return questions[:QUESTIONS_PER_QUIZ]
+
+
+def run(sizes=(1000, 10000, 100000), repeat=200, seed=0):
+    results = {}
+    for size in sizes:
+        with temp_db() as path:
+            repo = QuizRepository(path)
+            # Seeded, so the cache hit rate is the same from run to run
+            bank = QuestionBank(repo, rng=random.Random(seed))
+            bank.init_schema(seed=())
+            bank.add_questions(synthetic_questions(size))
+            results[f"sample ms @ {size}"] = mean_ms(lambda: bank.sample(QUESTIONS_PER_QUIZ), repeat)
+            results[f"sample by topic+difficulty ms @ {size}"] = mean_ms(
+                lambda: bank.sample(QUESTIONS_PER_QUIZ, topic="web", difficulty=2), repeat)
+            results[f"cache hit rate @ {size}"] = bank.cache.stats()["hit_rate"]
+            uncached = QuestionBank(repo, cache=QuestionCache(0))
+            results[f"uncached sample ms @ {size}"] = mean_ms(lambda: uncached.sample(QUESTIONS_PER_QUIZ), repeat)
+            repo.close()
+        results[f"legacy build+shuffle ms @ {size}"] = mean_ms(lambda: legacy_start(size), max(1, repeat // 100))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark question sampling against bank size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+    report("Question bank sampling", run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
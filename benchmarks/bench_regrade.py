@@ -0,0 +1,92 @@
+# Re-scoring stored responses after an answer-key correction: the NumPy
+# scorer on millions of in-memory responses next to a plain Python loop, and
+# regrade_results() end to end on a results table.
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks._common import report, temp_db
+from benchmarks.bench_question_bank import synthetic_questions
+from database import QuizRepository, pack_responses
+from question_bank import QuestionBank
+from quiz_engine import QUESTIONS_PER_QUIZ
+from regrade import answer_key, regrade_results, score_responses
+
+
+def python_scores(key, pairs, lengths):
+    scores = []
+    position = 0
+    for length in lengths:
+        score = 0
+        for question_id, option in pairs[position:position + length]:
+            if option >= 0 and question_id < len(key) and key[question_id] == option:
+                score += 1
+        scores.append(score)
+        position += length
+    return scores
+
+
+def run(responses=5000000, questions=10000, db_results=100000, seed=0):
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    key = rng.integers(0, 4, size=questions + 1, dtype=np.int32)
+    count = responses // QUESTIONS_PER_QUIZ
+    pairs = np.empty((count * QUESTIONS_PER_QUIZ, 2), dtype=np.int32)
+    pairs[:, 0] = rng.integers(1, questions + 1, size=len(pairs))
+    pairs[:, 1] = rng.integers(0, 4, size=len(pairs))
+    lengths = np.full(count, QUESTIONS_PER_QUIZ, dtype=np.int64)
+
+    start = time.perf_counter()
+    scores = score_responses(key, pairs, lengths)
+    results["numpy responses/s"] = len(pairs) / (time.perf_counter() - start)
+
+    # The Python loop is far slower, so time it on a slice
+    sample = min(count, 20000)
+    key_list, pair_list = key.tolist(), pairs[:sample * QUESTIONS_PER_QUIZ].tolist()
+    start = time.perf_counter()
+    slow = python_scores(key_list, pair_list, [QUESTIONS_PER_QUIZ] * sample)
+    results["python responses/s"] = sample * QUESTIONS_PER_QUIZ / (time.perf_counter() - start)
+    assert slow == scores[:sample].tolist()
+
+    with temp_db() as path:
+        repo = QuizRepository(path)
+        repo.init_schema()
+        bank = QuestionBank(repo)
+        bank.init_schema(seed=())
+        bank.add_questions(synthetic_questions(1000))
+        stored_key = answer_key(repo)
+        picker = random.Random(seed)
+        rows = []
+        for i in range(db_results):
+            answers = []
+            for question_id in picker.sample(range(1, 1001), QUESTIONS_PER_QUIZ):
+                answers += (question_id, picker.randrange(4))
+            score = sum(stored_key[answers[j]] == answers[j + 1] for j in range(0, len(answers), 2))
+            rows.append((f"user{i % 5000:05d}", int(score), pack_responses(answers)))
+        with repo.transaction() as conn:
+            conn.executemany("INSERT INTO results (username, score, responses) VALUES (?, ?, ?)", rows)
+
+        # Correct the key of 1% of the questions, then re-score everything
+        for question_id in range(1, 1001, 100):
+            bank.set_answer(question_id, (int(stored_key[question_id]) + 1) % 4)
+        stats = regrade_results(repo)
+        results["regrade stored results/s"] = stats["results_per_second"]
+        results["regrade changed share"] = stats["changed"] / stats["results"]
+        repo.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark bulk re-scoring of stored responses")
+    parser.add_argument("--responses", type=int, default=5000000, help="in-memory responses to score")
+    parser.add_argument("--db-results", type=int, default=100000, help="results stored for the end-to-end run")
+    args = parser.parse_args(argv)
+    report(f"Regrading ({args.responses:,} responses, {args.db_results:,} stored results)",
+           run(args.responses, db_results=args.db_results))
+
+
+if __name__ == "__main__":
+    main()
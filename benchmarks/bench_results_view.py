@@ -0,0 +1,77 @@
+# Frame times while the results view fills in for a long exam: the old
+# single pass with one insert per answer, which blocks the window until it is
+# done, against QuizApp.fill_results, which spreads the work over several
+# turns of the event loop. Needs a display (or Xvfb).
+import argparse
+import time
+import tkinter as tk
+from types import SimpleNamespace
+
+import metrics
+from benchmarks._common import report
+from main import QuizApp
+from quiz_engine import QUESTIONS, QuizEngine
+
+
+def finished_session(n):
+    questions = [dict(QUESTIONS[i % len(QUESTIONS)], id=i + 1) for i in range(n)]
+    engine = QuizEngine(questions, questions_per_quiz=n)
+    session = engine.start_session("student")
+    session.questions = list(engine.questions)
+    while not session.finished:
+        session.submit_index(session.current_question.answer_index)
+    return session
+
+
+def run(n=200, repeat=5):
+    root = tk.Tk()
+    root.withdraw()
+    text = tk.Text(root, width=90, height=20)
+    text.pack()
+    answers = finished_session(n).user_answers
+    results = {}
+
+    # Before: every answer inserted in one callback
+    start = time.perf_counter()
+    for _ in range(repeat):
+        text.delete(1.0, tk.END)
+        for i, result in enumerate(answers):
+            text.insert(tk.END, f"Q{i+1}: {result.question.text}\n"
+                                f"Your Answer: {result.selected_option}\n"
+                                f"Correct Answer: {result.correct_answer}\n"
+                                f"Explanation: {result.explanation}\n\n")
+        root.update()
+    results["single pass frame ms"] = (time.perf_counter() - start) / repeat * 1000
+
+    # After: the app's incremental fill, driven by the real event loop
+    metrics.enable()
+    metrics.reset()
+    view = SimpleNamespace(root=root, result_text=text, _results_job=None)
+    view.fill_results = lambda *args: QuizApp.fill_results(view, *args)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        text.delete(1.0, tk.END)
+        view.fill_results(answers, 0, time.perf_counter())
+        while view._results_job is not None:
+            root.update()
+    total = (time.perf_counter() - start) / repeat
+    frames = metrics.snapshot()["timers"]["ui.results_frame"]
+    metrics.disable()
+    results["incremental fill total ms"] = total * 1000
+    results["incremental frame p50 ms"] = frames["p50"] * 1000
+    results["incremental frame p99 ms"] = frames["p99"] * 1000
+    results["incremental frame max ms"] = frames["max"] * 1000
+    root.destroy()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark filling the results view for a long exam")
+    parser.add_argument("-n", type=int, default=200, help="questions in the exam")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    report(f"Results view ({args.n} answers)", run(args.n, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Runs N quiz sessions end to end through QuizEngine and reports sessions per
+# second, answers graded per second and the memory each live session costs.
+import argparse
+import random
+import time
+import tracemalloc
+
+from benchmarks._common import report
+from quiz_engine import QuizEngine
+
+
+def run(n=10000, seed=0):
+    rng = random.Random(seed)
+    engine = QuizEngine(rng=random.Random(seed))
+
+    # Memory: keep every session alive until all have been answered
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    sessions = [engine.start_session(f"user{i}") for i in range(n)]
+    for session in sessions:
+        while not session.finished:
+            session.submit(rng.choice(session.current_question.options))
+    elapsed = time.perf_counter() - start
+    used = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, "filename"))
+    tracemalloc.stop()
+
+    # Throughput: create, answer and discard sessions one at a time
+    start = time.perf_counter()
+    for i in range(n):
+        session = engine.start_session(f"user{i}")
+        while not session.finished:
+            session.submit(rng.choice(session.current_question.options))
+        engine.end_session(session.session_id)
+    throughput = n / (time.perf_counter() - start)
+
+    # Grading alone: the submit-by-index path the GUI uses on every answer
+    session = engine.start_session("grader")
+    questions, options = session.questions, [rng.randrange(len(q.options)) for q in session.questions]
+    start = time.perf_counter()
+    for i in range(n):
+        session.current_question_index = 0
+        session.score = 0
+        del session.responses[:]
+        for option in options:
+            session.submit_index(option)
+    graded = n * len(questions) / (time.perf_counter() - start)
+
+    return {
+        "sessions/s": throughput,
+        "answers graded/s": graded,
+        "concurrent sessions/s (traced)": n / elapsed,
+        "bytes per live session": used / n,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark headless quiz sessions")
+    parser.add_argument("-n", type=int, default=10000, help="number of sessions")
+    args = parser.parse_args(argv)
+    report(f"Quiz engine ({args.n} sessions)", run(args.n))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Result write throughput against the number of shards: several processes
+# save results for users spread over the shards by ShardRouter, one commit
+# per result as the server does. With one shard every commit queues on the
+# same write lock; with more, writers for different shards proceed together.
+# Also times the parallel cross-shard leaderboard query.
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks._common import report
+from leaderboard import ShardedLeaderboard
+from sharding import ShardRouter
+
+
+def write_results(directory, shards, usernames, per_user):
+    router = ShardRouter(directory, shards, timeout=60.0)
+    for i in range(per_user):
+        for username in usernames:
+            router.save_quiz_result(username, i % 11)
+    router.close()
+
+
+def run(shard_counts=(1, 2, 4, 8), writers=None, users=400, per_user=5, repeat=20):
+    writers = writers or min(8, os.cpu_count() or 1)
+    names = [f"user{i:05d}" for i in range(users)]
+    results = {}
+    for shards in shard_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Create every shard up front so the timing is writes only
+            ShardRouter(tmp, shards).init_schema()
+            start = time.perf_counter()
+            with ProcessPoolExecutor(writers) as pool:
+                jobs = [pool.submit(write_results, tmp, shards, names[w::writers], per_user)
+                        for w in range(writers)]
+                for job in jobs:
+                    job.result()
+            results[f"{shards} shards results/s"] = users * per_user / (time.perf_counter() - start)
+
+            router = ShardRouter(tmp, shards)
+            board = ShardedLeaderboard(router)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                board.top(10)
+            results[f"{shards} shards top10 ms"] = (time.perf_counter() - start) / repeat * 1000
+            router.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark result writes against the number of shards")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8], help="shard counts to compare")
+    parser.add_argument("--writers", type=int, default=None, help="writer processes (default: up to 8)")
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--per-user", type=int, default=5, help="results saved per user")
+    args = parser.parse_args(argv)
+    results = run(args.shards, args.writers, args.users, args.per_user)
+    report(f"Sharded writes ({args.users * args.per_user:,} results)", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# Simulates an exam cohort against a throwaway database: every student
+# registers, logs in, answers a quiz with think time between questions, gets
+# a certificate (when ReportLab is installed) and saves the result. Students
+# are spread over worker processes, each driving the app's own functions from
+# main.py, so the numbers include hashing, the result journal and SQLite
+# locking between processes.
+#
+#   python -m benchmarks.loadgen --students 200 --workers 8 --think 0.5
+#
+# Connections use a short lock timeout and the generator retries on "database
+# is locked"; each retry is counted as a lock wait, which the sqlite3 module
+# gives no other way to observe. Grading is never retried: it is not
+# idempotent, and the statistics it feeds are written by their own
+# background writer, whose retries are counted as lock waits too.
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks._common import percentile, report
+from metrics import QUANTILES
+
+OPERATIONS = ("startup", "register", "login", "start quiz", "answer", "certificate", "save result",
+              "flush results", "flush stats")
+LOCK_TIMEOUT = 0.05
+GIVE_UP_AFTER = 60.0
+
+
+class Worker:
+    def __init__(self, db_path, work_dir, lock_timeout, think, seed):
+        # The journal and certificates must be per process, so point the app
+        # at this worker's own files before main is imported
+        os.environ["QUIZ_RESULT_JOURNAL"] = os.path.join(work_dir, "results.journal")
+        import database
+        import main
+        import metrics
+        from adaptive import QuestionStats
+        from passwords import PasswordHasher
+        from question_bank import QuestionBank
+        from quiz_engine import QuizEngine
+
+        # Counts the result and stats writers' retries on a locked database
+        metrics.enable()
+        self.metrics = metrics
+
+        self.main = main
+        self.work_dir = work_dir
+        self.think = think
+        self.rng = random.Random(seed)
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self.certificates = True
+        # "fast" hashing keeps the database, not scrypt, the thing under test;
+        # bench_passwords.py sizes hashing separately
+        repository = database.configure(db_path, hasher=PasswordHasher.from_level("fast"), timeout=lock_timeout)
+        # As in the GUI, every answer also updates the per-question statistics
+        self.stats = QuestionStats(repository)
+        self.engine = QuizEngine(bank=QuestionBank(repository, self.rng), listener=self.stats)
+
+    # Time fn(*args), retrying while another process holds the write lock
+    def call(self, operation, fn, *args):
+        start = time.perf_counter()
+        while True:
+            attempt = time.perf_counter()
+            try:
+                result = fn(*args)
+                break
+            except sqlite3.OperationalError as error:
+                if "locked" not in str(error) and "busy" not in str(error):
+                    raise
+                if attempt - start > GIVE_UP_AFTER:
+                    raise
+                time.sleep(self.rng.uniform(0.001, 0.01))
+                self.lock_waits += 1
+                self.lock_wait_seconds += time.perf_counter() - attempt
+        self.latencies[operation].append(time.perf_counter() - start)
+        return result
+
+    # Time fn(*args) once, for calls that must not be repeated
+    def once(self, operation, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.latencies[operation].append(time.perf_counter() - start)
+        return result
+
+    def pause(self):
+        if self.think:
+            time.sleep(self.rng.expovariate(1.0 / self.think))
+
+    def student(self, username):
+        main = self.main
+        self.call("register", main.register_user, username, "secret-password")
+        if not self.call("login", main.verify_user, username, "secret-password"):
+            raise RuntimeError(f"login failed for {username}")
+        session = self.call("start quiz", self.engine.start_session, username)
+        while not session.finished:
+            self.pause()
+            question = session.current_question
+            # Roughly the pass rate of a real cohort
+            option = question.answer_index if self.rng.random() < 0.7 else self.rng.randrange(len(question.options))
+            self.once("answer", session.submit_index, option)
+        if self.certificates:
+            try:
+                self.call("certificate", self.render_certificate, username, session.score, session.total)
+            except ImportError:
+                self.certificates = False
+        self.call("save result", main.save_quiz_result, username, session.score, session.responses)
+        self.engine.end_session(session.session_id)
+
+    def render_certificate(self, username, score, total):
+        from certificates import render_certificate
+        return render_certificate(username, score, total, out_dir=os.path.join(self.work_dir, "certificates"))
+
+    def finish(self):
+        # Write out whatever the result journal still holds, as the app does at exit
+        buffer = self.main.get_result_buffer()
+        self.call("flush results", self.flush, buffer)
+        buffer.close()
+        self.call("flush stats", self.flush_stats)
+        self.stats.close()
+        counters = self.metrics.snapshot()["counters"]
+        self.lock_waits += counters.get("results.retry", 0) + counters.get("stats.retry", 0)
+        self.main.close_repository()
+
+    def flush(self, buffer):
+        if not buffer.flush():
+            raise sqlite3.OperationalError("database is locked")
+
+    def flush_stats(self):
+        if not self.stats.flush():
+            raise sqlite3.OperationalError("database is locked")
+
+
+def run_worker(db_path, work_dir, usernames, lock_timeout, think, seed):
+    worker = Worker(db_path, work_dir, lock_timeout, think, seed)
+    # Starts the result writer thread
+    worker.call("startup", worker.main.init_db)
+    for username in usernames:
+        worker.student(username)
+    worker.finish()
+    return {"latencies": worker.latencies, "lock_waits": worker.lock_waits,
+            "lock_wait_seconds": worker.lock_wait_seconds, "certificates": worker.certificates}
+
+
+def run(students=100, workers=None, think=0.0, lock_timeout=LOCK_TIMEOUT, seed=0):
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "loadgen.db")
+        # Create the schema once up front so workers do not race to migrate it
+        from adaptive import QuestionStats
+        from database import QuizRepository
+        from question_bank import QuestionBank
+        repository = QuizRepository(db_path)
+        repository.init_schema()
+        QuestionBank(repository).init_schema()
+        QuestionStats(repository).init_schema()
+        repository.close()
+
+        names = [f"student{i:06d}" for i in range(students)]
+        start = time.perf_counter()
+        # One fresh process per worker, so each imports main with its own journal
+        with ProcessPoolExecutor(workers, max_tasks_per_child=1) as pool:
+            jobs = []
+            for w in range(workers):
+                work_dir = os.path.join(tmp, f"worker{w}")
+                os.makedirs(work_dir)
+                jobs.append(pool.submit(run_worker, db_path, work_dir, names[w::workers],
+                                        lock_timeout, think, seed + w))
+            outcomes = [job.result() for job in jobs]
+        elapsed = time.perf_counter() - start
+
+        with sqlite3.connect(db_path) as conn:
+            saved = conn.execute("SELECT count(*) FROM results").fetchone()[0]
+
+    results = {
+        "students": students,
+        "workers": workers,
+        "seconds": elapsed,
+        "students/s": students / elapsed,
+        "results saved": saved,
+        "lock waits": sum(o["lock_waits"] for o in outcomes),
+        "lock wait seconds": sum(o["lock_wait_seconds"] for o in outcomes),
+    }
+    for operation in OPERATIONS:
+        samples = sorted(s for o in outcomes for s in o["latencies"][operation])
+        if not samples:
+            continue
+        results[f"{operation} ops/s"] = len(samples) / elapsed
+        for q in QUANTILES:
+            results[f"{operation} p{int(q * 100)} ms"] = percentile(samples, q) * 1000
+        results[f"{operation} max ms"] = samples[-1] * 1000
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate an exam cohort against a temporary database")
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds of thinking per question")
+    parser.add_argument("--lock-timeout", type=float, default=LOCK_TIMEOUT,
+                        help="seconds a statement waits for a lock before it counts as a lock wait")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    args = parser.parse_args(argv)
+    results = run(args.students, args.workers, args.think, args.lock_timeout)
+    report(f"Exam cohort ({args.students} students, {results['workers']} processes)", results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Runs the headless benchmark suites, writes the numbers to JSON and compares
+# them with a saved baseline. Exits non-zero when any metric is worse than the
+# baseline by more than the threshold, so it can gate a change:
+#
+#   python -m benchmarks.run --output baseline.json
+#   python -m benchmarks.run --baseline baseline.json --threshold 0.25
+import argparse
+import importlib
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks._common import report
+
+# Suite name -> (module, run() arguments). Sizes are kept small enough for
+# the whole run, repeats included, to finish in about a minute; each module's
+# own CLI can be used for bigger numbers.
+SUITES = {
+    "db": ("benchmarks.bench_db", {"n": 200}),
+    "sampling": ("benchmarks.bench_question_bank", {"sizes": (1000, 10000, 50000), "repeat": 100}),
+    "grading": ("benchmarks.bench_sessions", {"n": 10000}),
+    "certificates": ("benchmarks.bench_certificates", {"n": 40}),
+    "regrade": ("benchmarks.bench_regrade", {"responses": 2000000, "db_results": 20000}),
+}
+DEFAULT_THRESHOLD = 0.25
+
+
+# Rates ("/s") and hit rates are better when higher; times, sizes and
+# everything else when lower
+def higher_is_better(metric):
+    return "/s" in metric or "hit rate" in metric
+
+
+# Best value of each metric over several runs, which is far steadier than a
+# single run or the mean on a busy machine
+def best_of(runs):
+    best = dict(runs[0])
+    for result in runs[1:]:
+        for metric, value in result.items():
+            best[metric] = max(best[metric], value) if higher_is_better(metric) else min(best[metric], value)
+    return best
+
+
+def run_suites(names, repeat=3):
+    results = {}
+    skipped = {}
+    for name in names:
+        module_name, options = SUITES[name]
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as error:
+            # reportlab and numpy are optional; a missing library skips its suite
+            skipped[name] = str(error)
+            print(f"Skipping {name}: {error}", file=sys.stderr)
+            continue
+        start = time.perf_counter()
+        results[name] = best_of([module.run(**options) for _ in range(repeat)])
+        report(f"{name} ({time.perf_counter() - start:.1f}s)", results[name])
+    return results, skipped
+
+
+# List of (suite, metric, baseline, current, change) for every metric that got
+# worse by more than `threshold` (0.25 = 25%). The "legacy" metrics time the
+# old code kept for reference and are not checked.
+def regressions(baseline, current, threshold=DEFAULT_THRESHOLD):
+    found = []
+    for suite, metrics in current.items():
+        for metric, value in metrics.items():
+            before = baseline.get(suite, {}).get(metric)
+            if before is None or metric.startswith("legacy") or before <= 0:
+                continue
+            change = (value - before) / before
+            worse = -change if higher_is_better(metric) else change
+            if worse > threshold:
+                found.append((suite, metric, before, value, change))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suites and check for regressions")
+    parser.add_argument("suites", nargs="*", metavar="SUITE",
+                        help=f"suites to run (default: all of {', '.join(SUITES)})")
+    parser.add_argument("--output", metavar="FILE", help="write the results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against results saved with --output")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per suite; the best value is kept")
+    args = parser.parse_args(argv)
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    results, skipped = run_suites(args.suites or list(SUITES), args.repeat)
+    document = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+        "skipped": skipped,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    found = regressions(baseline, results, args.threshold)
+    for suite, metric, before, value, change in found:
+        print(f"REGRESSION {suite}: {metric} {before:,.3f} -> {value:,.3f} ({change:+.0%})")
+    if found:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passwords import is_hashed
+from question_bank import INSERT_QUESTION, question_row
+
+BATCH_SIZE = 10000
+
+CREATE_PROGRESS = '''CREATE TABLE IF NOT EXISTS import_progress (
+                        source TEXT NOT NULL,
+                        kind TEXT NOT NULL,
+                        records_done INTEGER NOT NULL,
+                        finished INTEGER NOT NULL DEFAULT 0,
+                        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (source, kind))'''
+SAVE_PROGRESS = '''INSERT INTO import_progress (source, kind, records_done, finished, updated_at)
+                   VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                   ON CONFLICT (source, kind) DO UPDATE SET
+                       records_done = excluded.records_done,
+                       finished = excluded.finished,
+                       updated_at = excluded.updated_at'''
+
+INSERT_USER = "INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)"
+INSERT_RESULT = "INSERT INTO results (username, score, created_at) VALUES (?, ?, coalesce(?, CURRENT_TIMESTAMP))"
+
+EXPORTS = {
+    "users": ("SELECT username, password FROM users ORDER BY username", ("username", "password")),
+    "results": ("SELECT id, username, score, created_at FROM results ORDER BY id",
+                ("id", "username", "score", "created_at")),
+    "questions": ("SELECT id, question, option1, option2, option3, option4, answer, explanation, topic, difficulty "
+                  "FROM questions ORDER BY id",
+                  ("id", "question", "option1", "option2", "option3", "option4",
+                   "answer", "explanation", "topic", "difficulty")),
+}
+KINDS = tuple(EXPORTS)
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+# Yield one dict per record without reading the whole file into memory
+def read_records(path, fmt=None):
+    if detect_format(path, fmt) == "jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+
+def user_params(records, hasher, workers):
+    # Hashing dominates user imports; hashlib releases the GIL, so use threads
+    def prepare(record):
+        password = record["password"]
+        return record["username"], password if is_hashed(password) else hasher.hash(password)
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(prepare, records))
+
+
+def result_params(records):
+    return [(r["username"], int(r["score"]), r.get("created_at") or None) for r in records]
+
+
+def question_params(records):
+    rows = []
+    for r in records:
+        options = r.get("options")
+        if options is None:
+            options = [r[f"option{i}"] for i in range(1, 5) if r.get(f"option{i}")]
+        rows.append(question_row({**r, "options": options, "difficulty": int(r.get("difficulty") or 1)}))
+    return rows
+
+
+# Stream a CSV/JSONL file into users, results or questions. Each batch is
+# inserted with executemany in one transaction together with the number of
+# records consumed so far, so a failed run resumes exactly where it stopped.
+def import_file(repository, kind, path, fmt=None, batch_size=BATCH_SIZE, restart=False,
+                hasher=None, workers=None, progress=None):
+    if kind not in KINDS:
+        raise ValueError(f"unknown import kind: {kind}")
+    source = os.path.abspath(path)
+    hasher = hasher or repository.hasher
+    workers = workers or os.cpu_count() or 1
+    statement = {"users": INSERT_USER, "results": INSERT_RESULT, "questions": INSERT_QUESTION}[kind]
+
+    with repository.transaction() as conn:
+        conn.execute(CREATE_PROGRESS)
+        if restart:
+            conn.execute("DELETE FROM import_progress WHERE source = ? AND kind = ?", (source, kind))
+        row = conn.execute("SELECT records_done, finished FROM import_progress WHERE source = ? AND kind = ?",
+                           (source, kind)).fetchone()
+    done, finished = row if row else (0, 0)
+    if finished:
+        return {"records": done, "imported": 0, "skipped": done, "seconds": 0.0, "rows_per_second": 0.0}
+
+    skipped = done
+    imported = 0
+    start = time.perf_counter()
+    records = read_records(path, fmt)
+    # Skip what an earlier run already committed
+    for _ in range(done):
+        next(records, None)
+
+    batch = []
+
+    def flush(final):
+        nonlocal done, imported
+        if kind == "users":
+            params = user_params(batch, hasher, workers)
+        elif kind == "results":
+            params = result_params(batch)
+        else:
+            params = question_params(batch)
+        with repository.transaction() as conn:
+            conn.executemany(statement, params)
+            done += len(batch)
+            conn.execute(SAVE_PROGRESS, (source, kind, done, int(final)))
+        imported += len(batch)
+        batch.clear()
+        if progress:
+            elapsed = time.perf_counter() - start
+            progress(done, imported / elapsed if elapsed else 0.0)
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush(False)
+    flush(True)
+
+    elapsed = time.perf_counter() - start
+    return {"records": done, "imported": imported, "skipped": skipped, "seconds": elapsed,
+            "rows_per_second": imported / elapsed if elapsed else 0.0}
+
+
+# Stream a table out to CSV/JSONL a batch at a time
+def export_file(repository, kind, path, fmt=None, batch_size=BATCH_SIZE, progress=None):
+    if kind not in KINDS:
+        raise ValueError(f"unknown export kind: {kind}")
+    query, columns = EXPORTS[kind]
+    fmt = detect_format(path, fmt)
+    count = 0
+    start = time.perf_counter()
+    with repository.reader() as conn, open(path, "w", newline="", encoding="utf-8") as f:
+        cursor = conn.execute(query)
+        writer = None
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+            count += len(rows)
+            if progress:
+                elapsed = time.perf_counter() - start
+                progress(count, count / elapsed if elapsed else 0.0)
+    elapsed = time.perf_counter() - start
+    return {"records": count, "seconds": elapsed, "rows_per_second": count / elapsed if elapsed else 0.0}
+
+
+def print_progress(records, rate):
+    print(f"\r  {records:,} records ({rate:,.0f} rows/s)", end="", file=sys.stderr, flush=True)
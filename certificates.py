@@ -0,0 +1,146 @@
+import argparse
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, Rect, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+import metrics
+from database import DB_PATH, QuizRepository
+from quiz_engine import PASS_MARK, QUESTIONS_PER_QUIZ
+
+CERTIFICATE_DIR = "certificates"
+
+
+def certificate_path(user_name, out_dir=CERTIFICATE_DIR, suffix=""):
+    # Usernames end up in file names, so keep only characters safe on every OS
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", user_name) or "user"
+    return os.path.join(out_dir, f"{safe_name}{suffix}_certificate.pdf")
+
+
+# Border, title, caption and signature line are identical on every
+# certificate; build them once per process and stamp them onto each page
+@lru_cache(maxsize=1)
+def static_page():
+    width, height = letter
+    page = Drawing(width, height)
+    page.add(Rect(0.5 * inch, 0.5 * inch, width - inch, height - inch,
+                  strokeColor=colors.black, strokeWidth=4, fillColor=None))
+    page.add(String(width / 2.0, height - 1.5 * inch, "Certificate of Achievement",
+                    fontName="Helvetica-Bold", fontSize=30, fillColor=colors.darkblue, textAnchor="middle"))
+    page.add(String(width / 2.0, height - 3.5 * inch, "For successfully completing the quiz",
+                    fontName="Helvetica", fontSize=16, fillColor=colors.black, textAnchor="middle"))
+    page.add(String(1.5 * inch, 1.5 * inch, "________________________",
+                    fontName="Helvetica", fontSize=14, fillColor=colors.black))
+    page.add(String(1.5 * inch, 1.2 * inch, "Signature",
+                    fontName="Helvetica", fontSize=14, fillColor=colors.black))
+    return page
+
+
+# Render one certificate PDF and return its path
+@metrics.timed("certificate.render")
+def render_certificate(user_name, score, total=QUESTIONS_PER_QUIZ, out_dir=CERTIFICATE_DIR, suffix="", date=None):
+    os.makedirs(out_dir, exist_ok=True)
+    certificate_file = certificate_path(user_name, out_dir, suffix)
+    c = canvas.Canvas(certificate_file, pagesize=letter)
+    width, height = letter
+
+    renderPDF.draw(static_page(), c, 0, 0)
+
+    # Per-student text
+    c.setFont("Helvetica", 18)
+    c.setFillColor(colors.black)
+    c.drawCentredString(width / 2.0, height - 2.5 * inch, f"Presented to {user_name}")
+
+    c.setFont("Helvetica-Bold", 16)
+    c.setFillColor(colors.green if score >= PASS_MARK else colors.red)
+    c.drawCentredString(width / 2.0, height - 4.5 * inch, f"Your Score: {score} out of {total}")
+
+    current_date = (date or datetime.now()).strftime("%B %d, %Y")
+    c.setFont("Helvetica", 12)
+    c.setFillColor(colors.black)
+    c.drawCentredString(width / 2.0, height - 5.5 * inch, f"Date: {current_date}")
+
+    c.save()
+    return certificate_file
+
+
+def _render_job(job):
+    return render_certificate(*job)
+
+
+def _warm_worker():
+    static_page()
+
+
+# Certificate jobs rendered in worker processes so neither the Tk loop nor the
+# server waits on ReportLab. The pool starts on first use.
+class CertificateQueue:
+    def __init__(self, workers=None, out_dir=CERTIFICATE_DIR):
+        self.workers = workers or os.cpu_count() or 1
+        self.out_dir = out_dir
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # Spawned, not forked: the GUI has Tk and several threads running, and
+            # a fork taken while one of them holds a lock can hang the worker
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    # Queue one certificate; returns a Future resolving to the PDF path
+    def submit(self, user_name, score, total=QUESTIONS_PER_QUIZ):
+        return self.executor.submit(render_certificate, user_name, score, total, self.out_dir)
+
+    # Render (user_name, score, total, suffix) jobs in parallel, yielding paths in order
+    def render_many(self, jobs, chunksize=16):
+        jobs = ((name, score, total, self.out_dir, suffix) for name, score, total, suffix in jobs)
+        return self.executor.map(_render_job, jobs, chunksize=chunksize)
+
+    # Bulk mode: one certificate per row of the results table
+    def render_all_results(self, repository, total=QUESTIONS_PER_QUIZ):
+        with repository.reader() as conn:
+            rows = conn.execute("SELECT rowid, username, score FROM results ORDER BY rowid").fetchall()
+        jobs = ((username, score, total, f"_{rowid}") for rowid, username, score in rows)
+        return list(self.render_many(jobs))
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render certificates for every saved quiz result")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--out", default=CERTIFICATE_DIR, help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    repository = QuizRepository(args.db)
+    jobs = CertificateQueue(args.workers, args.out)
+    start = time.perf_counter()
+    try:
+        paths = jobs.render_all_results(repository)
+    finally:
+        jobs.shutdown()
+        repository.close()
+    elapsed = time.perf_counter() - start
+    rate = len(paths) / elapsed if elapsed else 0.0
+    print(f"Rendered {len(paths)} certificates into {args.out} in {elapsed:.2f}s "
+          f"({rate:.1f}/s, {rate / jobs.workers:.1f}/s per core)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import hashlib
+import os
+
+import metrics
+
+
+# Append-only record of one quiz in progress. The file starts with the
+# question ids and then gains one short line per answer or move:
+#
+#   Q 12,7,33,4,19      questions in quiz order
+#   A 0 2               question 0 answered with option 2 (-1: nothing picked)
+#   N 3                 moved to question 3
+#
+# Each call writes a single line and flushes it to the OS without fsync, which
+# keeps it to a few microseconds and survives the app crashing or being closed.
+class Checkpoint:
+    def __init__(self, path, mode="a"):
+        self.path = path
+        self._file = open(path, mode, encoding="ascii")
+
+    def _write(self, line):
+        with metrics.timer("session.checkpoint"):
+            self._file.write(line)
+            self._file.flush()
+
+    def answered(self, question_index, option_index):
+        self._write(f"A {question_index} {option_index}\n")
+
+    def moved(self, question_index):
+        self._write(f"N {question_index}\n")
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    # The quiz's result has been saved; nothing is left to resume
+    def finish(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# A quiz read back from its checkpoint file
+class SavedSession:
+    __slots__ = ("username", "question_ids", "answers", "current_index")
+
+    def __init__(self, username, question_ids, answers, current_index):
+        self.username = username
+        self.question_ids = question_ids
+        self.answers = answers
+        self.current_index = current_index
+
+    @property
+    def finished(self):
+        return self.current_index >= len(self.question_ids)
+
+
+# One checkpoint file per user in `directory`, which belongs to one
+# database (see QuizRepository.checkpoint_dir), so users of different
+# databases or tenants never see each other's quizzes
+class CheckpointStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    # Named by a digest of the exact username: "rahul k" and "rahul_k", or
+    # "RSML123" and "rsml123" on a case-insensitive filesystem, never share a file
+    def path(self, username):
+        digest = hashlib.sha256(username.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.session")
+
+    # Start a new checkpoint for `session`, replacing any older one
+    def begin(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        checkpoint = Checkpoint(self.path(session.username), "w")
+        checkpoint._write("Q " + ",".join(str(q.id) for q in session.questions) + "\n")
+        return checkpoint
+
+    # Keep appending to the checkpoint of a resumed session
+    def reopen(self, username):
+        return Checkpoint(self.path(username))
+
+    def load(self, username):
+        try:
+            with open(self.path(username), encoding="ascii") as f:
+                lines = f.read().splitlines()
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+        if not lines or not lines[0].startswith("Q "):
+            return None
+        try:
+            question_ids = [int(i) for i in lines[0][2:].split(",")]
+        except ValueError:
+            return None
+        answers = []
+        current = 0
+        for line in lines[1:]:
+            fields = line.split()
+            # A crash can cut the last line short; ignore anything malformed
+            if len(fields) == 3 and fields[0] == "A" and fields[1].isdigit():
+                index = int(fields[1])
+                if index < len(question_ids):
+                    answers.append((index, int(fields[2]) if fields[2].lstrip("-").isdigit() else -1))
+                    current = index + 1
+            elif len(fields) == 2 and fields[0] == "N" and fields[1].isdigit():
+                current = min(int(fields[1]), len(question_ids))
+        return SavedSession(username, question_ids, answers, current)
+
+    def discard(self, username):
+        try:
+            os.remove(self.path(username))
+        except FileNotFoundError:
+            pass
+
+    # Recreate the saved quiz in `engine`; None if a question no longer
+    # exists or an answer does not fit it (the question was edited, or the
+    # file is damaged), so the caller discards the checkpoint
+    def restore(self, engine, saved):
+        questions = [engine.bank.get(i) for i in saved.question_ids]
+        if any(q is None for q in questions):
+            return None
+        if any(not -1 <= option < len(questions[index].options) for index, option in saved.answers):
+            return None
+        try:
+            return engine.restore_session(saved.username, questions, saved.answers, saved.current_index)
+        except ValueError:
+            return None
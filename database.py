@@ -0,0 +1,401 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from array import array
+from contextlib import contextmanager
+
+import metrics
+from passwords import get_hasher, is_hashed
+
+# QUIZ_DB overrides the default file for every tool that has a --db option
+DB_PATH = os.environ.get("QUIZ_DB", 'quiz_app.db')
+
+# SQL statements are kept as module constants so every call hands sqlite3 the
+# exact same string and hits the per-connection prepared statement cache.
+CREATE_USERS = '''CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    password TEXT NOT NULL)'''
+CREATE_RESULTS = '''CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    score INTEGER NOT NULL,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP)'''
+INSERT_USER = "INSERT INTO users (username, password) VALUES (?, ?)"
+INSERT_USER_IGNORE = "INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)"
+SELECT_PASSWORD = "SELECT password FROM users WHERE username = ?"
+# Only replace the hash that was checked, in case the password changed meanwhile
+UPDATE_PASSWORD = "UPDATE users SET password = ? WHERE username = ? AND password = ?"
+INSERT_RESULT = "INSERT INTO results (username, score) VALUES (?, ?)"
+# Results written through a ResultBuffer carry a client-generated reference,
+# so replaying a journal after a crash never inserts the same result twice
+INSERT_RESULT_REF = '''INSERT OR IGNORE INTO results (username, score, created_at, client_ref, responses)
+                       VALUES (?, ?, coalesce(?, CURRENT_TIMESTAMP), ?, ?)'''
+INSERT_RESULT_RESPONSES = "INSERT INTO results (username, score, responses) VALUES (?, ?, ?)"
+
+
+# Aggregates kept up to date by triggers on every insert into results, so
+# leaderboards and statistics never need to scan the results table
+CREATE_STATS = (
+    '''CREATE TABLE IF NOT EXISTS user_stats (
+        username TEXT PRIMARY KEY,
+        attempts INTEGER NOT NULL,
+        total_score INTEGER NOT NULL,
+        best_score INTEGER NOT NULL,
+        last_played TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS score_histogram (
+        score INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL)''',
+    "CREATE INDEX IF NOT EXISTS idx_results_username_score ON results (username, score)",
+    "CREATE INDEX IF NOT EXISTS idx_user_stats_best ON user_stats (best_score DESC, username)",
+    '''CREATE TRIGGER IF NOT EXISTS results_stats_insert AFTER INSERT ON results BEGIN
+        INSERT INTO user_stats (username, attempts, total_score, best_score, last_played)
+        VALUES (NEW.username, 1, NEW.score, NEW.score, NEW.created_at)
+        ON CONFLICT (username) DO UPDATE SET
+            attempts = attempts + 1,
+            total_score = total_score + excluded.total_score,
+            best_score = max(best_score, excluded.best_score),
+            last_played = excluded.last_played;
+        INSERT INTO score_histogram (score, count) VALUES (NEW.score, 1)
+        ON CONFLICT (score) DO UPDATE SET count = count + 1;
+    END''',
+    # Deleting can lower a best score; the (username, score) index finds the
+    # new maximum without a scan
+    '''CREATE TRIGGER IF NOT EXISTS results_stats_delete AFTER DELETE ON results BEGIN
+        UPDATE user_stats SET
+            attempts = attempts - 1,
+            total_score = total_score - OLD.score,
+            best_score = coalesce((SELECT max(score) FROM results WHERE username = OLD.username), 0)
+        WHERE username = OLD.username;
+        DELETE FROM user_stats WHERE username = OLD.username AND attempts <= 0;
+        UPDATE score_histogram SET count = count - 1 WHERE score = OLD.score;
+        DELETE FROM score_histogram WHERE score = OLD.score AND count <= 0;
+    END''',
+)
+
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+def migrate_results_v1(conn):
+    # Early databases created results without an id or timestamp; rebuild it
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+    if "created_at" not in columns:
+        conn.execute("DROP TRIGGER IF EXISTS results_stats_insert")
+        conn.execute("DROP TRIGGER IF EXISTS results_stats_delete")
+        conn.execute("ALTER TABLE results RENAME TO results_old")
+        conn.execute(CREATE_RESULTS)
+        conn.execute("INSERT INTO results (id, username, score, created_at) "
+                     "SELECT rowid, username, score, NULL FROM results_old ORDER BY rowid")
+        conn.execute("DROP TABLE results_old")
+    for statement in CREATE_STATS:
+        conn.execute(statement)
+    # Backfill the aggregates for rows written before the triggers existed
+    conn.execute("DELETE FROM user_stats")
+    conn.execute("DELETE FROM score_histogram")
+    conn.execute('''INSERT INTO user_stats (username, attempts, total_score, best_score, last_played)
+                    SELECT username, count(*), sum(score), max(score), max(created_at)
+                    FROM results GROUP BY username''')
+    conn.execute('''INSERT INTO score_histogram (score, count)
+                    SELECT score, count(*) FROM results GROUP BY score''')
+
+
+def migrate_results_v2(conn):
+    conn.execute("ALTER TABLE results ADD COLUMN client_ref TEXT")
+    conn.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_results_client_ref ON results (client_ref)
+                    WHERE client_ref IS NOT NULL''')
+
+
+# Keeps the aggregates right when a result is re-scored (see regrade.py)
+CREATE_SCORE_UPDATE_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS results_stats_update AFTER UPDATE OF score ON results BEGIN
+    UPDATE user_stats SET
+        total_score = total_score - OLD.score + NEW.score,
+        best_score = coalesce((SELECT max(score) FROM results WHERE username = NEW.username), 0)
+    WHERE username = NEW.username;
+    UPDATE score_histogram SET count = count - 1 WHERE score = OLD.score;
+    DELETE FROM score_histogram WHERE score = OLD.score AND count <= 0;
+    INSERT INTO score_histogram (score, count) VALUES (NEW.score, 1)
+    ON CONFLICT (score) DO UPDATE SET count = count + 1;
+END'''
+
+
+def migrate_results_v3(conn):
+    # Each result's answers as packed (question id, option index) int32 pairs
+    conn.execute("ALTER TABLE results ADD COLUMN responses BLOB")
+    conn.execute(CREATE_SCORE_UPDATE_TRIGGER)
+
+
+def migrate_results_v4(conn):
+    # A user's most recent results (Leaderboard.history) without a sort
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_username_id ON results (username, id)")
+
+
+MIGRATIONS = (migrate_results_v1, migrate_results_v2, migrate_results_v3, migrate_results_v4)
+
+
+# Responses are stored little-endian whatever machine wrote them, so a shared
+# database file reads the same everywhere
+def pack_responses(responses):
+    if responses is None:
+        return None
+    packed = array("i", responses)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_responses(blob):
+    responses = array("i")
+    responses.frombytes(blob)
+    if sys.byteorder == "big":
+        responses.byteswap()
+    return responses
+
+
+# Open a connection tuned for many short statements from several threads.
+# `timeout` is how long a statement waits for another writer's lock.
+def connect(path, timeout=5.0):
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, cached_statements=128)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL only syncs at checkpoints instead of on every commit
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+# Data-access object holding persistent connections to one database file.
+# SQLite allows a single writer at a time, so all writes share one connection
+# behind a lock while reads draw from a small pool for multi-threaded callers.
+class QuizRepository:
+    def __init__(self, path=DB_PATH, pool_size=4, commit_every=1, hasher=None, timeout=5.0, commit_delay=0.05):
+        self.path = path
+        self.timeout = timeout
+        self.hasher = hasher or get_hasher()
+        self.pool_size = pool_size
+        # Number of result inserts to group into one transaction, and the
+        # longest (seconds) a partial group waits: an open transaction holds
+        # the database's write lock, which other processes queue behind
+        self.commit_every = commit_every
+        self.commit_delay = commit_delay
+        self._commit_timer = None
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._pending = 0
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._closed = False
+
+    def _write_conn(self):
+        if self._writer is None:
+            if self._closed:
+                raise sqlite3.ProgrammingError("repository is closed")
+            self._writer = connect(self.path, self.timeout)
+        return self._writer
+
+    @contextmanager
+    def writer(self):
+        # Yield the shared write connection; the caller decides when to commit
+        with self._write_lock:
+            yield self._write_conn()
+
+    @contextmanager
+    def reader(self):
+        conn = None
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._reader_lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("repository is closed")
+                if self._reader_count < self.pool_size:
+                    self._reader_count += 1
+                    conn = connect(self.path, self.timeout)
+            if conn is None:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._readers.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        # Run several writes atomically and commit once at the end. BEGIN is
+        # explicit so schema changes are covered as well as data changes.
+        with self.writer() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                self._pending = 0
+                raise
+            conn.commit()
+            self._pending = 0
+
+    def init_schema(self):
+        with self.transaction() as conn:
+            conn.execute(CREATE_USERS)
+            conn.execute(CREATE_RESULTS)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+
+    @metrics.timed("db.register_user")
+    def register_user(self, username, password):
+        # Hash before taking the write lock so slow hashing never blocks other writers
+        stored = self.hasher.hash(password)
+        # Registrations commit straight away so the user can log in from any connection
+        with self.writer() as conn:
+            try:
+                conn.execute(INSERT_USER, (username, stored))
+                created = True
+            except sqlite3.IntegrityError:
+                created = False
+            # Commit either way: a failed insert still leaves the transaction,
+            # and its write lock, open, and any batched results in it must be kept
+            conn.commit()
+            self._pending = 0
+            return created
+
+    def register_users(self, rows):
+        # Bulk variant: returns the number of accounts created, skipping existing
+        # names. Passwords that are already hashed are stored unchanged.
+        rows = [(username, password if is_hashed(password) else self.hasher.hash(password))
+                for username, password in rows]
+        with self.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(INSERT_USER_IGNORE, rows)
+            return conn.total_changes - before
+
+    @metrics.timed("db.verify_user")
+    def verify_user(self, username, password):
+        with self.reader() as conn:
+            row = conn.execute(SELECT_PASSWORD, (username,)).fetchone()
+        if row is None:
+            metrics.count("login.unknown_user")
+            return self.hasher.verify_missing(password)
+        stored = row[0]
+        with metrics.timer("password.verify"):
+            ok = self.hasher.verify(password, stored)
+        if not ok:
+            metrics.count("login.failed")
+            return False
+        metrics.count("login.succeeded")
+        # Plaintext rows and hashes made with older cost settings are upgraded on login
+        if self.hasher.needs_rehash(stored):
+            upgraded = self.hasher.hash(password)
+            with self.writer() as conn:
+                conn.execute(UPDATE_PASSWORD, (upgraded, username, stored))
+                conn.commit()
+                self._pending = 0
+        return True
+
+    # Hash every remaining plaintext password; returns the number of rows changed
+    def migrate_passwords(self, batch_size=500):
+        with self.reader() as conn:
+            rows = [row for row in conn.execute("SELECT username, password FROM users") if not is_hashed(row[1])]
+        for start in range(0, len(rows), batch_size):
+            batch = [(self.hasher.hash(password), username, password)
+                     for username, password in rows[start:start + batch_size]]
+            with self.transaction() as conn:
+                conn.executemany(UPDATE_PASSWORD, batch)
+        return len(rows)
+
+    # `responses` optionally keeps the answers behind the score, as the
+    # session's (question id, option index) array
+    @metrics.timed("db.save_quiz_result")
+    def save_quiz_result(self, username, score, responses=None):
+        with self.writer() as conn:
+            if responses is None:
+                conn.execute(INSERT_RESULT, (username, score))
+            else:
+                conn.execute(INSERT_RESULT_RESPONSES, (username, score, pack_responses(responses)))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                conn.commit()
+                self._pending = 0
+            elif self._pending == 1:
+                # First insert of a new group: commit it by the deadline even
+                # if no more arrive
+                self._commit_timer = threading.Timer(self.commit_delay, self.flush)
+                self._commit_timer.daemon = True
+                self._commit_timer.start()
+
+    def save_quiz_results(self, rows):
+        with self.transaction() as conn:
+            conn.executemany(INSERT_RESULT, rows)
+
+    # Rows of (username, score, created_at, client_ref, packed responses); rows
+    # whose reference is already stored are skipped. Returns the number inserted.
+    def save_journaled_results(self, rows):
+        # rowcount, unlike total_changes, leaves out the aggregate trigger writes
+        with self.transaction() as conn:
+            return conn.executemany(INSERT_RESULT_REF, rows).rowcount
+
+    def flush(self):
+        # Commit any result inserts still waiting for a full batch
+        with self._write_lock:
+            if self._writer is not None and self._pending:
+                self._writer.commit()
+                self._pending = 0
+
+    # Where ResultBuffer keeps results not yet written to this database
+    @property
+    def journal_path(self):
+        return f"{self.path}.journal"
+
+    # Where checkpoints of quizzes in progress against this database are kept
+    @property
+    def checkpoint_dir(self):
+        return f"{self.path}.sessions"
+
+    def close(self):
+        with self._write_lock:
+            if self._commit_timer is not None:
+                self._commit_timer.cancel()
+            self.flush()
+            self._closed = True
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_default_repository = None
+_default_lock = threading.Lock()
+
+
+# Point the module-level helpers at another database file or change pool settings
+def configure(path=DB_PATH, **options):
+    global _default_repository
+    with _default_lock:
+        if _default_repository is not None:
+            _default_repository.close()
+        _default_repository = QuizRepository(path, **options)
+    return _default_repository
+
+
+# Shared repository used by the app's module-level functions
+def get_repository():
+    global _default_repository
+    with _default_lock:
+        if _default_repository is None:
+            _default_repository = QuizRepository(DB_PATH)
+        return _default_repository
+
+
+def close_repository():
+    global _default_repository
+    with _default_lock:
+        if _default_repository is not None:
+            _default_repository.close()
+            _default_repository = None
@@ -0,0 +1,118 @@
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DB_PATH, QuizRepository
+from sharding import SHARD_DIR, ShardRouter
+
+
+# Read side of the statistics kept in user_stats and score_histogram. Every
+# query here reads an index or a small aggregate table, never all results.
+class Leaderboard:
+    def __init__(self, repository):
+        self.repository = repository
+
+    # Best score per user, highest first
+    def top(self, n=10):
+        with self.repository.reader() as conn:
+            rows = conn.execute('''SELECT username, best_score, attempts FROM user_stats
+                                   ORDER BY best_score DESC, username LIMIT ?''', (n,)).fetchall()
+        return [{"username": u, "best_score": best, "attempts": attempts} for u, best, attempts in rows]
+
+    def user_stats(self, username):
+        with self.repository.reader() as conn:
+            row = conn.execute('''SELECT attempts, total_score, best_score, last_played FROM user_stats
+                                  WHERE username = ?''', (username,)).fetchone()
+        if row is None:
+            return None
+        attempts, total_score, best_score, last_played = row
+        return {
+            "username": username,
+            "attempts": attempts,
+            "best_score": best_score,
+            "average_score": total_score / attempts,
+            "last_played": last_played,
+        }
+
+    # Number of results per score, e.g. {0: 3, 4: 14, 5: 19}
+    def histogram(self):
+        with self.repository.reader() as conn:
+            return dict(conn.execute("SELECT score, count FROM score_histogram ORDER BY score"))
+
+    # Most recent results for one user, read backwards along the (username, id) index
+    def history(self, username, limit=20):
+        with self.repository.reader() as conn:
+            rows = conn.execute('''SELECT score, created_at FROM results WHERE username = ?
+                                   ORDER BY id DESC LIMIT ?''', (username, limit)).fetchall()
+        return [{"score": score, "created_at": created_at} for score, created_at in rows]
+
+
+# The same queries over every shard of a ShardRouter. Each shard is asked in
+# parallel (sqlite3 releases the GIL while a query runs) and the partial
+# answers are merged: top(n) takes the top n of each shard, so the merge
+# reads at most n rows per shard.
+class ShardedLeaderboard:
+    def __init__(self, router, workers=8):
+        self.router = router
+        self.workers = workers
+
+    def _each(self, fn):
+        boards = [Leaderboard(repository) for repository in self.router.all_repositories()]
+        if not boards:
+            return []
+        with ThreadPoolExecutor(min(self.workers, len(boards))) as pool:
+            return list(pool.map(fn, boards))
+
+    def top(self, n=10):
+        entries = [entry for part in self._each(lambda board: board.top(n)) for entry in part]
+        entries.sort(key=lambda entry: (-entry["best_score"], entry["username"]))
+        return entries[:n]
+
+    # A user whose shard has no database yet has no results either
+    def user_stats(self, username, tenant=None):
+        repository = self.router.existing_repository(username, tenant)
+        return Leaderboard(repository).user_stats(username) if repository is not None else None
+
+    def histogram(self):
+        total = Counter()
+        for part in self._each(Leaderboard.histogram):
+            total.update(part)
+        return dict(sorted(total.items()))
+
+    def history(self, username, limit=20, tenant=None):
+        repository = self.router.existing_repository(username, tenant)
+        return Leaderboard(repository).history(username, limit) if repository is not None else []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the quiz leaderboard")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("-n", type=int, default=10, help="number of users to show")
+    parser.add_argument("--user", help="show statistics for one user instead")
+    parser.add_argument("--shards", type=int, help="combine the N hash shards (and any tenants) in --shard-dir")
+    parser.add_argument("--shard-dir", default=SHARD_DIR, help="directory for shard and tenant databases")
+    args = parser.parse_args(argv)
+
+    if args.shards:
+        repository = ShardRouter(args.shard_dir, args.shards)
+        board = ShardedLeaderboard(repository)
+    else:
+        repository = QuizRepository(args.db)
+        repository.init_schema()
+        board = Leaderboard(repository)
+    if args.user:
+        stats = board.user_stats(args.user)
+        if stats is None:
+            print(f"No results for {args.user}")
+        else:
+            print(f"{args.user}: {stats['attempts']} attempts, best {stats['best_score']}, "
+                  f"average {stats['average_score']:.2f}")
+    else:
+        for rank, entry in enumerate(board.top(args.n), start=1):
+            print(f"{rank:>3}. {entry['username']:<20} {entry['best_score']:>3}  ({entry['attempts']} attempts)")
+        print("Score histogram:", board.histogram())
+    repository.close()
+
+
+if __name__ == "__main__":
+    main()
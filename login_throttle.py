@@ -0,0 +1,138 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+# Attempts a username gets at once, and how fast they come back (per second)
+USER_BURST = 5
+USER_RATE = 1 / 10
+# Per client address; a lab behind one NAT address shares this, so it is
+# generous and only stops scripted floods
+SOURCE_BURST = 60
+SOURCE_RATE = 5.0
+# Bounds on the number of buckets and remembered failures
+MAX_ENTRIES = 10000
+# How long a wrong username/password pair is answered without the database
+FAILURE_TTL = 30.0
+
+
+class LoginThrottled(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many login attempts. Try again in {math.ceil(retry_after)} seconds.")
+        self.retry_after = retry_after
+
+
+# Token buckets keyed by username or source, least recently used first. An
+# entry that has had time to refill completely is the same as no entry, so
+# such entries are dropped from the front as they are met, and the oldest
+# ones go whenever the table is over max_entries.
+class _Buckets:
+    def __init__(self, burst, rate, max_entries):
+        self.burst = burst
+        self.rate = rate
+        self.max_entries = max_entries
+        self.idle_after = burst / rate
+        self._entries = OrderedDict()
+
+    # Seconds until `key` may try again; 0 means it may try now
+    def wait(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        tokens = min(self.burst, entry[0] + (now - entry[1]) * self.rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key, now):
+        entry = self._entries.pop(key, None)
+        tokens = self.burst if entry is None else min(self.burst, entry[0] + (now - entry[1]) * self.rate)
+        self._entries[key] = (tokens - 1, now)
+        self._evict(now)
+
+    def forget(self, key):
+        self._entries.pop(key, None)
+
+    def _evict(self, now):
+        entries = self._entries
+        while entries:
+            key, (_, updated) = next(iter(entries.items()))
+            if len(entries) <= self.max_entries and now - updated < self.idle_after:
+                break
+            del entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Guards password checks against brute force and against a room of students
+# pressing Login over and over. Every check that would reach the database
+# takes a token from the username's bucket and, if known, the source's
+# bucket; with either empty, verify() raises LoginThrottled without touching
+# the database. A wrong username/password pair is remembered for a short
+# while and answered from memory; passwords are kept only as a keyed hash
+# under a key that never leaves the process. Safe to share between threads.
+class LoginThrottle:
+    def __init__(self, user_burst=USER_BURST, user_rate=USER_RATE, source_burst=SOURCE_BURST,
+                 source_rate=SOURCE_RATE, max_entries=MAX_ENTRIES, failure_ttl=FAILURE_TTL, clock=time.monotonic):
+        self.users = _Buckets(user_burst, user_rate, max_entries)
+        self.sources = _Buckets(source_burst, source_rate, max_entries)
+        self.max_entries = max_entries
+        self.failure_ttl = failure_ttl
+        self.clock = clock
+        self._failures = OrderedDict()
+        self._key = os.urandom(32)
+        self._lock = threading.Lock()
+
+    def _failure_key(self, username, password):
+        digest = hashlib.blake2b(password.encode(), key=self._key, digest_size=16).digest()
+        return username, digest
+
+    # verify(username, password) wrapped with the limits; returns its result
+    # or raises LoginThrottled
+    def verify(self, verify, username, password, source=None):
+        failure_key = self._failure_key(username, password)
+        with self._lock:
+            now = self.clock()
+            failed_at = self._failures.get(failure_key)
+            if failed_at is not None and now - failed_at < self.failure_ttl:
+                metrics.count("login.cached_failure")
+                return False
+            wait = self.users.wait(username, now)
+            if source is not None:
+                wait = max(wait, self.sources.wait(source, now))
+            if wait:
+                metrics.count("login.throttled")
+                raise LoginThrottled(wait)
+            self.users.take(username, now)
+            if source is not None:
+                self.sources.take(source, now)
+        ok = verify(username, password)
+        with self._lock:
+            if ok:
+                # A user who got in is not held back by earlier typos
+                self.users.forget(username)
+            else:
+                now = self.clock()
+                failures = self._failures
+                failures.pop(failure_key, None)
+                failures[failure_key] = now
+                # Oldest first: drop expired failures, and the oldest beyond the bound
+                while failures and (len(failures) > self.max_entries
+                                    or now - next(iter(failures.values())) >= self.failure_ttl):
+                    failures.popitem(last=False)
+        return ok
+
+    # Drop what is remembered about a username, e.g. after it was registered
+    # or its password changed, so an earlier failure is not replayed
+    def forget(self, username):
+        with self._lock:
+            self.users.forget(username)
+            for key in [key for key in self._failures if key[0] == username]:
+                del self._failures[key]
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self.users), "sources": len(self.sources), "failures": len(self._failures)}
@@ -1,116 +1,107 @@
 import tkinter as tk
 from tkinter import messagebox, font, ttk
-import random
-import pygame
-import sqlite3
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from datetime import datetime
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph
+import argparse
+import atexit
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from database import DB_PATH, configure, get_repository, close_repository
+from quiz_engine import QuizEngine, validate_credentials
+from question_bank import QuestionBank
+from adaptive import AdaptiveQuizEngine, QuestionStats
+from result_buffer import LEGACY_JOURNAL_PATH, ResultBuffer
+from checkpoints import CheckpointStore
+from audio import AudioPlayer
+from sharding import SHARD_DIR, ShardRouter
+from login_throttle import LoginThrottle, LoginThrottled
+
+# Long result lists are written into the results view a slice at a time so
+# each slice fits comfortably inside one frame at 60 Hz
+RESULTS_FRAME_BUDGET = 0.008
+RESULTS_PER_INSERT = 10
+
+# Release pooled connections and commit any batched results on exit
+atexit.register(close_repository)
+
+# With --shards or --tenant, users and their results are spread over several
+# database files; questions and statistics stay on the router's primary shard
+_router = None
+
+def use_shards(directory, shards=1, tenant=None):
+    global _router
+    _router = ShardRouter(directory, shards, tenant)
+    atexit.register(_router.close)
+    return _router
+
+# Database holding the question bank and question statistics
+def home_repository():
+    return _router.primary if _router is not None else get_repository()
+
+# Results are journaled locally and written to the database in the background
+_result_buffer = None
+
+def get_result_buffer():
+    global _result_buffer
+    if _result_buffer is None:
+        _result_buffer = ResultBuffer(_router or get_repository())
+        # A journal left by an older version was written for the default
+        # database; in its place start() takes it over like any orphan
+        legacy_target = get_repository().journal_path
+        if (_router is None and get_repository().path == DB_PATH and os.path.exists(LEGACY_JOURNAL_PATH)
+                and not os.path.exists(legacy_target)):
+            os.replace(LEGACY_JOURNAL_PATH, legacy_target)
+        # Registered after close_repository, so it runs first and can still write
+        atexit.register(_result_buffer.close)
+    return _result_buffer
 
 # SQLite Database Initialization
 def init_db():
-    conn = sqlite3.connect('quiz_app.db')
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                        username TEXT PRIMARY KEY,
-                        password TEXT NOT NULL)''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS results (
-                        username TEXT,
-                        score INTEGER)''')
-    conn.commit()
-    conn.close()
+    if _router is not None:
+        _router.init_schema()
+    else:
+        get_repository().init_schema()
+        QuestionBank(get_repository()).init_schema()
+        QuestionStats(get_repository()).init_schema()
+    # Replay results a crashed or locked-out earlier run could not write
+    get_result_buffer().start()
+
+# Limits password checks per username and remembers recent wrong passwords
+_login_throttle = LoginThrottle()
 
 # User registration function
 def register_user(username, password):
-    conn = sqlite3.connect('quiz_app.db')
-    cursor = conn.cursor()
-    try:
-        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
+    created = (_router or get_repository()).register_user(username, password)
+    if created:
+        # Earlier failed logins for this name said "no such user"
+        _login_throttle.forget(username)
+    return created
 
-# User verification function
+# User verification function; raises LoginThrottled after too many attempts
 def verify_user(username, password):
-    conn = sqlite3.connect('quiz_app.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
-    user = cursor.fetchone()
-    conn.close()
-    return user is not None
-
-# Save quiz result
-def save_quiz_result(username, score):
-    conn = sqlite3.connect('quiz_app.db')
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO results (username, score) VALUES (?, ?)", (username, score))
-    conn.commit()
-    conn.close()
-
-# Generate Certificate
-def generate_certificate(user_name, score):
-    # Define the file name for the certificate
-    certificate_file = f"{user_name}_certificate.pdf"
-    
-    # Create a PDF canvas
-    c = canvas.Canvas(certificate_file, pagesize=letter)
-    width, height = letter
-
-    # Draw a border for the certificate
-    c.setStrokeColor(colors.black)
-    c.setLineWidth(4)
-    c.rect(0.5 * inch, 0.5 * inch, width - inch, height - inch)
-
-    # Add Certificate Title
-    c.setFont("Helvetica-Bold", 30)
-    c.setFillColor(colors.darkblue)
-    c.drawCentredString(width / 2.0, height - 1.5 * inch, "Certificate of Achievement")
-
-    # Add a congratulatory message
-    c.setFont("Helvetica", 18)
-    c.setFillColor(colors.black)
-    c.drawCentredString(width / 2.0, height - 2.5 * inch, f"Presented to {user_name}")
-
-    # Add description text
-    c.setFont("Helvetica", 16)
-    c.drawCentredString(width / 2.0, height - 3.5 * inch, "For successfully completing the quiz")
-
-    # Add the score
-    c.setFont("Helvetica-Bold", 16)
-    c.setFillColor(colors.green if score >= 3 else colors.red)
-    c.drawCentredString(width / 2.0, height - 4.5 * inch, f"Your Score: {score} out of 5")
-
-    # Add the current date
-    current_date = datetime.now().strftime("%B %d, %Y")
-    c.setFont("Helvetica", 12)
-    c.setFillColor(colors.black)
-    c.drawCentredString(width / 2.0, height - 5.5 * inch, f"Date: {current_date}")
-
-    # Optional: Add a signature area or logo (example of adding a logo image)
-    # c.drawImage("logo.png", 1 * inch, height - 7 * inch, width=1.5 * inch, preserveAspectRatio=True, mask='auto')
-
-    # Optionally, add a line for a signature
-    c.setFont("Helvetica", 14)
-    c.drawString(1.5 * inch, 1.5 * inch, "________________________")
-    c.drawString(1.5 * inch, 1.2 * inch, "Signature")
-
-    # Save the PDF
-    c.save()
-    
-    print(f"Certificate saved as {certificate_file}")
+    return _login_throttle.verify((_router or get_repository()).verify_user, username, password)
+
+# Save quiz result; only the journal write happens on the calling thread
+def save_quiz_result(username, score, responses=None):
+    get_result_buffer().add(username, score, responses)
+
+# Password hashing is deliberately slow, so account checks run on a small
+# worker pool instead of the Tk thread
+_auth_executor = None
+
+def run_in_background(fn, *args):
+    global _auth_executor
+    if _auth_executor is None:
+        _auth_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quiz-auth")
+    return _auth_executor.submit(fn, *args)
 
 # Main Quiz Application Class
 class QuizApp:
-    def __init__(self, root):
-        pygame.init()
-        self.click_sound = pygame.mixer.Sound("next_sound.wav")  # Load your sound file
+    def __init__(self, root, adaptive=False):
+        # Sounds load in the background once the login screen is up
+        self.audio = AudioPlayer()
+        self._certificate_jobs = None
 
         self.root = root
         self.root.title("Quiz Application")
@@ -126,7 +117,39 @@ class QuizApp:
         self.label_font = font.Font(family='Helvetica', size=18)
         self.button_font = font.Font(family='Helvetica', size=18, weight='bold')
 
-        # Login Screen Frame
+        # Quiz state and grading live in the engine; the GUI only drives a session
+        # Every graded answer updates the per-question statistics; adaptive mode
+        # also uses them to pick each next question
+        stats = QuestionStats(home_repository())
+        # Statistics are written by a background thread; write the rest on exit
+        atexit.register(stats.close)
+        bank = QuestionBank(home_repository())
+        # With QUIZ_QUESTION_CACHE_DIR set, start with the questions other
+        # instances on this machine already loaded, and leave ours for them
+        bank.load_shared_cache()
+        atexit.register(bank.save_shared_cache)
+        if adaptive:
+            self.engine = AdaptiveQuizEngine(bank, stats.load())
+        else:
+            self.engine = QuizEngine(bank=bank, listener=stats)
+        self.session = None
+        # Unfinished quizzes are checkpointed so they can be resumed after a
+        # crash. Adaptive quizzes pick questions as they go and are not resumable.
+        self.checkpoints = None if adaptive else CheckpointStore((_router or get_repository()).checkpoint_dir)
+        self.checkpoint = None
+
+        # Only the login screen is needed at startup; the other frames are
+        # built the first time they are shown
+        self.frame_registration = None
+        self.frame_quiz = None
+        self.frame_result = None
+        self.certificate_window = None
+        self._results_job = None
+        self.build_login_frame()
+        self.root.after_idle(self.audio.start)
+
+    # Login Screen Frame
+    def build_login_frame(self):
         self.frame_login = tk.Frame(self.root, bg='lightblue', bd=10, relief='raised')
         self.frame_login.pack(fill='both', expand=True, padx=20, pady=20)
 
@@ -156,7 +179,8 @@ class QuizApp:
         self.cancel_button = tk.Button(self.frame_login, text="Cancel", command=self.cancel, font=self.button_font, bg='red', fg='white', width=10)
         self.cancel_button.pack(pady=10)
 
-        # Registration Frame
+    # Registration Frame
+    def build_registration_frame(self):
         self.frame_registration = tk.Frame(self.root, bg='lightblue', bd=10, relief='raised')
 
         self.label_reg_title = tk.Label(self.frame_registration, text="Create an Account", bg='lightblue', font=self.title_font)
@@ -181,20 +205,23 @@ class QuizApp:
 
         self.back_button = tk.Button(self.frame_registration, text="Back to Login", command=self.back_to_login, font=self.button_font, bg='blue', fg='white', width=10)
         self.back_button.pack(pady=10)
+        return self.frame_registration
 
-        # Quiz Frame
+    # Quiz Frame
+    def build_quiz_frame(self):
         self.frame_quiz = tk.Frame(self.root, bg='lightblue', bd=10, relief='raised')
 
         self.label_question = tk.Label(self.frame_quiz, text="", bg='lightblue', font=self.label_font, wraplength=700)
         self.label_question.pack(pady=20)
 
-        self.var_option = tk.StringVar()
+        # Options are identified by position; -1 means nothing is selected
+        self.var_option = tk.IntVar(value=-1)
         self.options_frame = tk.Frame(self.frame_quiz, bg='lightblue')
         self.options_frame.pack(pady=20)
 
         self.options = []
         for i in range(4):
-            option = tk.Radiobutton(self.options_frame, text="", variable=self.var_option, value="", font=self.label_font, bg='lightblue')
+            option = tk.Radiobutton(self.options_frame, text="", variable=self.var_option, value=i, font=self.label_font, bg='lightblue')
             option.pack(anchor='w')
             self.options.append(option)
 
@@ -210,13 +237,10 @@ class QuizApp:
 
         self.progress = ttk.Progressbar(self.frame_quiz, orient="horizontal", length=300, mode="determinate")
         self.progress.pack(pady=20)
+        return self.frame_quiz
 
-
-        # Shuffle and select 5 questions each time
-        self.current_question_index = 0
-        self.score = 0
-
-        # Add Result Frame for showing answers and explanations
+    # Result Frame for showing answers and explanations
+    def build_result_frame(self):
         self.frame_result = tk.Frame(self.root, bg='lightblue', bd=10, relief='raised')
 
         self.label_result_title = tk.Label(self.frame_result, text="Quiz Results", font=self.title_font, bg='lightblue')
@@ -227,10 +251,21 @@ class QuizApp:
 
         self.button_certificate = tk.Button(self.frame_result, text="View Certificate", command=self.show_certificate, font=self.button_font, bg='green', fg='white', width=15)
         self.button_certificate.pack(pady=20)
-
-        # Other initializations
-        self.user_answers = []
-        self.score = 0
+        return self.frame_result
+
+    def get_frame(self, name):
+        frame = getattr(self, f"frame_{name}")
+        if frame is None:
+            frame = getattr(self, f"build_{name}_frame")()
+        return frame
+
+    # Heavy modules are imported on first use rather than at startup
+    @property
+    def certificate_jobs(self):
+        if self._certificate_jobs is None:
+            from certificates import CertificateQueue
+            self._certificate_jobs = CertificateQueue(workers=1)
+        return self._certificate_jobs
 
     def toggle_password(self):
         if self.show_pass:
@@ -258,18 +293,27 @@ class QuizApp:
         password = self.entry_pass.get()
 
         # Validation checks
-        if not username or not password:
-            messagebox.showerror("Login Failed", "Username and password cannot be empty.")
+        error = validate_credentials(username, password)
+        if error:
+            messagebox.showerror("Login Failed", error)
             return
-        if len(username) <= 5 or len(password) <= 5:
-            messagebox.showerror("Login Failed", "Username and password must be more than 5 characters.")
+
+        self.login_button.config(state=tk.DISABLED)
+        self.when_done(run_in_background(verify_user, username, password), self.finish_login)
+
+    def finish_login(self, job):
+        self.login_button.config(state=tk.NORMAL)
+        try:
+            ok = job.result()
+        except LoginThrottled as error:
+            messagebox.showerror("Login Failed", str(error))
             return
-  
-        if verify_user(username, password):
+        if ok:
             messagebox.showinfo("Login Successful", "Welcome to the quiz!")
             self.frame_login.pack_forget()
-            self.frame_quiz.pack(fill='both', expand=True)
-            self.start_quiz()  # Start the quiz and load questions
+            self.get_frame('quiz').pack(fill='both', expand=True)
+            if not self.resume_quiz():
+                self.start_quiz()  # Start the quiz and load questions
         else:
             messagebox.showerror("Login Failed", "Invalid username or password.")
 
@@ -278,257 +322,371 @@ class QuizApp:
         password = self.entry_reg_pass.get()
 
         # Validation checks
-        if not username or not password:
-            messagebox.showerror("Registration Failed", "Username and password cannot be empty.")
-            return
-        if len(username) <= 5 or len(password) <= 5:
-            messagebox.showerror("Registration Failed", "Username and password must be more than 5 characters.")
+        error = validate_credentials(username, password)
+        if error:
+            messagebox.showerror("Registration Failed", error)
             return
 
-        if register_user(username, password):
+        self.register_button.config(state=tk.DISABLED)
+        self.when_done(run_in_background(register_user, username, password), self.finish_registration)
+
+    def finish_registration(self, job):
+        self.register_button.config(state=tk.NORMAL)
+        if job.result():
             messagebox.showinfo("Registration Successful", "Account created successfully!")
             self.back_to_login()
         else:
             messagebox.showerror("Registration Failed", "Username already exists.")
 
+    # Call callback(job) on the Tk thread once a background job has finished
+    def when_done(self, job, callback, interval=50):
+        if job.done():
+            callback(job)
+        else:
+            self.root.after(interval, self.when_done, job, callback, interval)
+
     def show_registration_frame(self):
         self.frame_login.pack_forget()
-        self.frame_registration.pack(fill='both', expand=True)
+        self.get_frame('registration').pack(fill='both', expand=True)
 
     def back_to_login(self):
         self.frame_registration.pack_forget()
         self.frame_login.pack(fill='both', expand=True)
 
     def start_quiz(self):
-        self.questions = self.load_questions()
-        self.shuffle_questions()
+        self.session = self.engine.start_session(self.entry_user.get())
+        if self.checkpoints is not None:
+            self.checkpoint = self.checkpoints.begin(self.session)
+        self.load_question()
+
+    # Offer to continue a quiz left unfinished by an earlier run
+    def resume_quiz(self):
+        if self.checkpoints is None:
+            return False
+        username = self.entry_user.get()
+        saved = self.checkpoints.load(username)
+        if saved is None:
+            return False
+        if not messagebox.askyesno("Resume Quiz", "You have an unfinished quiz. Do you want to continue it?"):
+            self.checkpoints.discard(username)
+            return False
+        session = self.checkpoints.restore(self.engine, saved)
+        if session is None:
+            self.checkpoints.discard(username)
+            return False
+        self.session = session
+        self.checkpoint = self.checkpoints.reopen(username)
         self.load_question()
+        return True
 
-    def load_questions(self):
-    # Sample questions with explanations
-        return [
-            {"question": "What is the output of print(2 ** 3)?",
-            "options": ["6", "8", "9", "10"],
-            "answer": "8",
-            "explanation": "The ** operator in Python is used for exponentiation. So, 2 ** 3 means 2 raised to the power of 3, which equals 8."},
-
-            {"question": "Which of the following is not a programming language?",
-            "options": ["Python", "Java", "HTML", "C#"],
-            "answer": "HTML",
-            "explanation": "HTML is a markup language used to structure web content, but it is not a programming language."},
-
-            {"question": "What does HTML stand for?",
-            "options": ["Hypertext Markup Language", "Hightext Machine Language", "Hyperloop Machine Language", "None of the above"],
-            "answer": "Hypertext Markup Language",
-            "explanation": "HTML stands for Hypertext Markup Language, which is used to create the structure of web pages."},
-
-            {"question": "Which symbol is used for comments in Python?",
-            "options": ["//", "#", "/*", "<!--"],
-            "answer": "#",
-            "explanation": "The # symbol is used to create comments in Python."},
-
-            {"question": "What is the correct file extension for Python files?",
-            "options": [".py", ".pt", ".pyt", ".pyth"],
-            "answer": ".py",
-            "explanation": "Python files have the .py extension."},
-
-            {"question": "Which company developed Java?",
-            "options": ["Microsoft", "Sun Microsystems", "Apple", "Oracle"],
-            "answer": "Sun Microsystems",
-            "explanation": "Java was developed by Sun Microsystems, which was later acquired by Oracle."},
-
-            {"question": "Which of the following is a Python framework?",
-            "options": ["Flask", "Django", "Both", "None"],
-            "answer": "Both",
-            "explanation": "Flask and Django are popular web frameworks for building applications in Python."},
-
-            {"question": "What does CSS stand for?",
-            "options": ["Creative Style Sheets", "Colorful Style Sheets", "Computer Style Sheets", "Cascading Style Sheets"],
-            "answer": "Cascading Style Sheets",
-            "explanation": "CSS stands for Cascading Style Sheets and is used to style the layout of web pages."},
-
-            {"question": "Which of the following is a correct variable name in Python?",
-            "options": ["myVar", "my-var", "my var", "my.var"],
-            "answer": "myVar",
-            "explanation": "Variable names in Python cannot contain spaces, dashes, or dots. Only alphanumeric characters and underscores are allowed."},
-
-            {"question": "What does SQL stand for?",
-            "options": ["Structured Query Language", "Structured Question Language", "Style Query Language", "None of the above"],
-            "answer": "Structured Query Language",
-            "explanation": "SQL stands for Structured Query Language and is used to communicate with databases."},
-
-            {"question": "Which of the following is not a data type in Python?",
-            "options": ["List", "Tuple", "Dictionary", "Character"],
-            "answer": "Character",
-            "explanation": "Python does not have a character data type; single characters are treated as strings of length 1."},
-
-            {"question": "What keyword is used to define a function in Python?",
-            "options": ["define", "function", "def", "fun"],
-            "answer": "def",
-            "explanation": "The def keyword is used to define a function in Python."},
-
-            {"question": "Which of the following is used to handle exceptions in Python?",
-            "options": ["try", "catch", "finally", "all of the above"],
-            "answer": "all of the above",
-            "explanation": "In Python, try, except, and finally blocks are used to handle exceptions."},
-
-            {"question": "Which operator is used to compare two values in Python?",
-            "options": ["==", "=", "===", "!="],
-            "answer": "==",
-            "explanation": "The == operator checks if two values are equal, while = is used for assignment."},
-
-            {"question": "What is the main purpose of a loop in programming?",
-            "options": ["To repeat a block of code", "To perform conditional checks", "To define variables", "To store data"],
-            "answer": "To repeat a block of code",
-            "explanation": "A loop allows you to repeat a block of code multiple times."},
-
-            {"question": "Which keyword is used to exit a loop in Python?",
-            "options": ["exit", "break", "stop", "end"],
-            "answer": "break",
-            "explanation": "The break keyword is used to exit a loop prematurely."},
-
-            {"question": "What does API stand for?",
-            "options": ["Application Programming Interface", "Application Protocol Interface", "Advanced Programming Interface", "None of the above"],
-            "answer": "Application Programming Interface",
-            "explanation": "API stands for Application Programming Interface, which allows different software systems to communicate with each other."},
-
-            {"question": "Which method is used to add an element to the end of a list in Python?",
-            "options": ["add()", "append()", "insert()", "extend()"],
-            "answer": "append()",
-            "explanation": "The append() method is used to add an element to the end of a list."},
-
-            {"question": "What is the correct syntax to create a variable in Python?",
-            "options": ["variable_name = value", "create variable_name = value", "var variable_name = value", "None of the above"],
-            "answer": "variable_name = value",
-            "explanation": "In Python, variables are created by assigning a value using the = operator."},
-
-            {"question": "Which of the following is used to import modules in Python?",
-            "options": ["import module_name", "require module_name", "include module_name", "load module_name"],
-            "answer": "import module_name",
-            "explanation": "The import keyword is used to include external modules or libraries in Python."}
-    ]
-
-
-    def shuffle_questions(self):
-        random.shuffle(self.questions)
-        self.questions = self.questions[:5]  # Select only 5 questions
 
+    @metrics.timed("ui.load_question")
     def load_question(self):
-        if self.current_question_index < len(self.questions):
-            question = self.questions[self.current_question_index]
-            self.label_question.config(text=question["question"])
+        question = self.session.current_question
+        if question is not None:
+            self.label_question.config(text=question.text)
+            self.var_option.set(-1)
             for i, option in enumerate(self.options):
-                option.config(text=question["options"][i], value=question["options"][i])
-            self.progress['value'] = (self.current_question_index / len(self.questions)) * 100
+                option.config(text=question.options[i])
+            self.progress['value'] = self.session.progress
             self.update_buttons_state()  # Update button states when loading a question
         else:
-            self.show_results()
+            self.show_results_with_explanation()
 
 
     def previous_question(self):
-            if self.current_question_index > 0:
-                self.current_question_index -= 1
+            if self.session.previous():
+                self.audio.play("previous")
+                self.save_position()
                 self.load_question()
                 self.update_buttons_state()
 
     def next_question(self):
-        if self.current_question_index < len(self.questions) - 1:
-            self.current_question_index += 1
+        if self.session.next():
+            self.audio.play("next")
+            self.save_position()
             self.load_question()
             self.update_buttons_state()
 
+    def save_position(self):
+        if self.checkpoint is not None:
+            self.checkpoint.moved(self.session.current_question_index)
+
     def update_buttons_state(self):
         # Disable Previous button if on the first question
-        if self.current_question_index == 0:
+        if self.session.is_first:
             self.prev_button.config(state=tk.DISABLED)
         else:
             self.prev_button.config(state=tk.NORMAL)
 
         # Disable Next button if on the last question
-        if self.current_question_index == len(self.questions) - 1:
+        if self.session.is_last:
             self.next_button.config(state=tk.DISABLED)
         else:
             self.next_button.config(state=tk.NORMAL)
 
 
     def submit_answer(self):
-        selected_option = self.var_option.get()
-        correct_answer = self.questions[self.current_question_index]["answer"]
-        self.user_answers.append({
-            "question": self.questions[self.current_question_index]["question"],
-            "selected_option": selected_option,
-            "correct_answer": correct_answer,
-            "explanation": self.questions[self.current_question_index]["explanation"]
-        })
-
-        if selected_option == correct_answer:
-            self.score += 1
+        index = self.session.current_question_index
+        selected = self.var_option.get()
+        self.session.submit_index(selected)
+        self.audio.play("submit")
+        if self.checkpoint is not None:
+            self.checkpoint.answered(index, selected)
 
         # Load next question or show results
-        self.current_question_index += 1
-        if self.current_question_index < len(self.questions):
+        if not self.session.finished:
             self.load_question()
         else:
             self.show_results_with_explanation()
 
     def show_results_with_explanation(self):
         self.frame_quiz.pack_forget()
-        self.frame_result.pack(fill='both', expand=True)
+        self.get_frame('result').pack(fill='both', expand=True)
 
         # Clear previous content in the result text area
+        if self._results_job is not None:
+            self.root.after_cancel(self._results_job)
         self.result_text.delete(1.0, tk.END)
 
-        # Display user's answers, correct answers, and explanations
-        for i, result in enumerate(self.user_answers):
-            result_summary = (f"Q{i+1}: {result['question']}\n"
-                              f"Your Answer: {result['selected_option']}\n"
-                              f"Correct Answer: {result['correct_answer']}\n"
-                              f"Explanation: {result['explanation']}\n\n")
-            self.result_text.insert(tk.END, result_summary)
-
-    
-
-    def show_certificate(self):
-        # Generate the certificate
-        generate_certificate(self.entry_user.get(), self.score)
-        # Display the certificate
-        certificate_window = tk.Toplevel(self.root)
-        certificate_window.title("Certificate")
-        certificate_window.geometry("600x400")
-        certificate_window.attributes("-fullscreen", True)
-        certificate_window.configure(bg='lightblue')
-
-        label_certificate = tk.Label(certificate_window, text="Congratulations!", font=self.title_font, bg='lightblue')
+        # Display user's answers, correct answers, and explanations. They are
+        # added over several turns of the event loop so a long exam never
+        # freezes the window while the text fills in.
+        answers = self.session.user_answers
+        self._results_job = self.root.after_idle(self.fill_results, answers, 0, time.perf_counter())
+
+    def fill_results(self, answers, position, previous):
+        start = time.perf_counter()
+        # Time since the last slice started: the frame time the user sees,
+        # including Tk's own redraw between slices
+        metrics.observe("ui.results_frame", start - previous)
+        while position < len(answers) and time.perf_counter() - start < RESULTS_FRAME_BUDGET:
+            chunk = []
+            for i in range(position, min(position + RESULTS_PER_INSERT, len(answers))):
+                result = answers[i]
+                chunk.append(f"Q{i+1}: {result.question.text}\n"
+                             f"Your Answer: {result.selected_option}\n"
+                             f"Correct Answer: {result.correct_answer}\n"
+                             f"Explanation: {result.explanation}\n\n")
+            self.result_text.insert(tk.END, "".join(chunk))
+            position += len(chunk)
+        metrics.observe("ui.results_slice", time.perf_counter() - start)
+        if position < len(answers):
+            self._results_job = self.root.after(1, self.fill_results, answers, position, start)
+        else:
+            self._results_job = None
+
+    # The certificate window is built once and shown again on later clicks
+    def build_certificate_window(self):
+        window = tk.Toplevel(self.root)
+        window.title("Certificate")
+        window.geometry("600x400")
+        window.attributes("-fullscreen", True)
+        window.configure(bg='lightblue')
+        # Closing only hides it, ready for the next time
+        window.protocol("WM_DELETE_WINDOW", window.withdraw)
+
+        label_certificate = tk.Label(window, text="Congratulations!", font=self.title_font, bg='lightblue')
         label_certificate.pack(pady=20)
 
-        label_score = tk.Label(certificate_window, text=f"Your Score: {self.score} out of 5", font=self.label_font, bg='lightblue')
-        label_score.pack(pady=10)
+        self.label_certificate_score = tk.Label(window, text="", font=self.label_font, bg='lightblue')
+        self.label_certificate_score.pack(pady=10)
 
-        label_message = tk.Label(certificate_window, text="Your certificate has been generated.", font=self.label_font, bg='lightblue')
-        label_message.pack(pady=10)
+        self.label_certificate_message = tk.Label(window, text="", font=self.label_font, bg='lightblue')
+        self.label_certificate_message.pack(pady=10)
 
-        button_exit = tk.Button(certificate_window, text="Exit", command=self.root.quit, font=self.button_font, bg='red', fg='white', width=10)
+        button_exit = tk.Button(window, text="Exit", command=self.root.quit, font=self.button_font, bg='red', fg='white', width=10)
         button_exit.pack(pady=20)
 
         save_result = tk.Button(
-        certificate_window,
+        window,
         text="Save Result",
-        command=lambda: self.save_and_notify(self.entry_user.get(), self.score),
+        command=lambda: self.save_and_notify(self.entry_user.get(), self.session.score),
         font=self.button_font,
         bg='blue',
         fg='white',
         width=10
     )
         save_result.pack(pady=10)
+        self.certificate_window = window
+        return window
+
+    def show_certificate(self):
+        # Display the certificate window first: it holds the Save Result
+        # button, which must work even when no PDF can be made
+        window = self.certificate_window
+        if window is None or not window.winfo_exists():
+            window = self.build_certificate_window()
+        self.label_certificate_score.config(text=f"Your Score: {self.session.score} out of {self.session.total}")
+        window.deiconify()
+        window.lift()
+        # Render the certificate in a worker process so the window stays responsive
+        submitted = time.perf_counter()
+        try:
+            job = self.certificate_jobs.submit(self.entry_user.get(), self.session.score, self.session.total)
+        except (ImportError, RuntimeError) as exc:
+            # ReportLab missing, or the worker pool broken or shut down
+            print(f"Certificate not generated: {exc}")
+            self.label_certificate_message.config(text="Certificate could not be generated.")
+            return
+        self.label_certificate_message.config(text="Generating your certificate...")
+        self.when_done(job, lambda job: self.finish_certificate(job, self.label_certificate_message, submitted))
+
+    def finish_certificate(self, job, label_message, submitted):
+        # Time from clicking the button to the PDF being ready, queueing included
+        metrics.observe("certificate.job", time.perf_counter() - submitted)
+        if job.cancelled() or job.exception() is not None:
+            label_message.config(text="Certificate could not be generated.")
+        else:
+            print(f"Certificate saved as {job.result()}")
+            label_message.config(text="Your certificate has been generated.")
 
     def save_and_notify(self, username, score):
-        save_quiz_result(username, score)  # Save the result to the database
+        save_quiz_result(username, score, self.session.responses)  # Save the result to the database
+        # The result is safely journaled, so the quiz no longer needs resuming
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
+            self.checkpoint = None
         messagebox.showinfo("Save Successful", "Your certificate has been saved successfully!")  # Show confirmation message
         self.root.quit()  # Exit the application
         
+# Startup profiler: python main.py --profile-startup
+def profile_startup():
+    import importlib
+    import os
+    import subprocess
+
+    # Import costs come from a fresh interpreter so nothing is cached yet
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=here, capture_output=True, text=True)
+    entries = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        # Each nesting level indents the module name by two more spaces
+        depth = (len(name) - len(name.lstrip()) + 1) // 2
+        entries.append((depth, int(parts[1]) / 1000, name.strip()))
+    # A module's own imports are listed just before it, one level deeper
+    total = 0.0
+    collecting = False
+    imports = []
+    for depth, ms, name in reversed(entries):
+        if depth == 1 and name == "main":
+            total = ms
+            collecting = True
+        elif depth == 1:
+            collecting = False
+        elif depth == 2 and total and collecting:
+            imports.append((ms, name))
+    imports.sort(reverse=True)
+    print("Import cost of main.py (direct imports, cumulative):")
+    for ms, name in imports[:10]:
+        print(f"  {name:<32} {ms:8.1f} ms")
+    print(f"  {'total':<32} {total:8.1f} ms")
+
+    print("Initialisation:")
+    try:
+        start = time.perf_counter()
+        root = tk.Tk()
+        print(f"  {'tk.Tk()':<32} {(time.perf_counter() - start) * 1000:8.1f} ms")
+    except tk.TclError as error:
+        print(f"  no display available ({error}); skipping window timings")
+    else:
+        start = time.perf_counter()
+        app = QuizApp(root)
+        print(f"  {'QuizApp(root)':<32} {(time.perf_counter() - start) * 1000:8.1f} ms")
+        start = time.perf_counter()
+        root.update()
+        print(f"  {'first paint':<32} {(time.perf_counter() - start) * 1000:8.1f} ms")
+        for name in ("registration", "quiz", "result"):
+            start = time.perf_counter()
+            app.get_frame(name)
+            print(f"  {f'{name} frame (deferred)':<32} {(time.perf_counter() - start) * 1000:8.1f} ms")
+        root.destroy()
+
+    print("Deferred until first use:")
+    for module in ("certificates", "pygame.mixer"):
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except ImportError as error:
+            print(f"  {module:<32} not available ({error})")
+        else:
+            print(f"  {module:<32} {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+# Bulk import/export: python main.py import users students.csv
+def run_bulk_command(args):
+    from bulk_io import export_file, import_file, print_progress
+    from passwords import PasswordHasher
+
+    if _router is not None and _router.tenant is None:
+        sys.exit("import/export works on one database; use --tenant, or --db with a shard file")
+    init_db()
+    if args.command == "import":
+        hasher = PasswordHasher.from_level(args.password_cost) if args.password_cost else None
+        stats = import_file(home_repository(), args.kind, args.path, args.format, args.batch_size,
+                            restart=args.restart, hasher=hasher, progress=print_progress)
+        print(f"\nImported {stats['imported']:,} {args.kind} records "
+              f"(skipped {stats['skipped']:,} already imported) at {stats['rows_per_second']:,.0f} rows/s")
+    else:
+        stats = export_file(home_repository(), args.kind, args.path, args.format, args.batch_size,
+                            progress=print_progress)
+        print(f"\nExported {stats['records']:,} {args.kind} records at {stats['rows_per_second']:,.0f} rows/s")
+
+
+def parse_args(argv=None):
+    from bulk_io import BATCH_SIZE, KINDS
+    from passwords import COST_LEVELS
+
+    parser = argparse.ArgumentParser(description="Python Quiz Application")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--profile-startup", action="store_true", help="report import and init costs, then exit")
+    parser.add_argument("--adaptive", action="store_true", help="pick each question to match the learner's ability")
+    parser.add_argument("--metrics", metavar="FILE", help="collect timings and write them to FILE on exit (.json or .prom)")
+    parser.add_argument("--profile", metavar="FILE", help="run cProfile and write its stats to FILE on exit")
+    parser.add_argument("--shards", type=int, help="spread users over N database files by username hash")
+    parser.add_argument("--tenant", help="keep users and results in the tenant's own database file")
+    parser.add_argument("--shard-dir", default=SHARD_DIR, help="directory for shard and tenant databases")
+    commands = parser.add_subparsers(dest="command")
+
+    importer = commands.add_parser("import", help="stream a CSV or JSONL file into the database")
+    importer.add_argument("kind", choices=KINDS)
+    importer.add_argument("path")
+    importer.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    importer.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="records per transaction")
+    importer.add_argument("--restart", action="store_true", help="ignore progress saved by an earlier run")
+    importer.add_argument("--password-cost", choices=sorted(COST_LEVELS),
+                          help="hash cost for imported passwords; upgraded on first login")
+
+    exporter = commands.add_parser("export", help="stream a table out to CSV or JSONL")
+    exporter.add_argument("kind", choices=KINDS)
+    exporter.add_argument("path")
+    exporter.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    exporter.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows fetched at a time")
+    return parser.parse_args(argv)
+
+
 # Start the application
 if __name__ == "__main__":
+    args = parse_args()
+    if args.metrics or args.profile:
+        metrics.enable(args.metrics, args.profile)
+    if args.db != DB_PATH:
+        configure(args.db)
+    if args.shards or args.tenant:
+        use_shards(args.shard_dir, args.shards or 1, args.tenant)
+    if args.profile_startup:
+        profile_startup()
+        sys.exit()
+    if args.command:
+        run_bulk_command(args)
+        sys.exit()
     root = tk.Tk()
-    quiz_app = QuizApp(root)
+    quiz_app = QuizApp(root, adaptive=args.adaptive)
     root.mainloop()
-
+    if quiz_app._certificate_jobs is not None:
+        quiz_app._certificate_jobs.shutdown(wait=False)
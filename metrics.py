@@ -0,0 +1,215 @@
+import atexit
+import functools
+import json
+import os
+import random
+import re
+import signal
+import threading
+import time
+
+RESERVOIR_SIZE = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+# Latency samples for one code path. Keeps exact count/sum/max and a fixed
+# size uniform reservoir for percentiles, so memory never grows.
+class Histogram:
+    __slots__ = ("count", "total", "maximum", "samples", "rng")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples = []
+        self.rng = random.Random(0)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(value)
+        else:
+            slot = self.rng.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = value
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        result = {"count": self.count, "sum": self.total, "max": self.maximum}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+        return result
+
+
+class _Registry:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.profiler = None
+        self.profile_path = None
+
+
+_registry = _Registry()
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def enabled():
+    return _registry.enabled
+
+
+def observe(name, seconds):
+    if not _registry.enabled:
+        return
+    with _registry.lock:
+        histogram = _registry.histograms.get(name)
+        if histogram is None:
+            histogram = _registry.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+def count(name, amount=1):
+    if _registry.enabled:
+        with _registry.lock:
+            _registry.counters[name] = _registry.counters.get(name, 0) + amount
+
+
+# Context manager timing a block: `with metrics.timer("db.verify_user"): ...`
+# Returns a shared no-op object while metrics are off.
+def timer(name):
+    return _Timer(name) if _registry.enabled else _NULL_TIMER
+
+
+# Decorator timing every call; when metrics are off it costs one flag check
+def timed(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _registry.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def reset():
+    with _registry.lock:
+        _registry.histograms.clear()
+        _registry.counters.clear()
+
+
+def snapshot():
+    with _registry.lock:
+        return {
+            "timers": {name: h.summary() for name, h in sorted(_registry.histograms.items())},
+            "counters": dict(sorted(_registry.counters.items())),
+        }
+
+
+def to_json():
+    return json.dumps(snapshot(), indent=2)
+
+
+def _prometheus_name(name):
+    return "quiz_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+# Prometheus text exposition format: timers as summaries in seconds
+def to_prometheus():
+    data = snapshot()
+    lines = []
+    for name, summary in data["timers"].items():
+        metric = _prometheus_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for q in QUANTILES:
+            lines.append(f'{metric}{{quantile="{q}"}} {summary[f"p{int(q * 100)}"]:.9f}')
+        lines.append(f"{metric}_sum {summary['sum']:.9f}")
+        lines.append(f"{metric}_count {summary['count']}")
+    for name, value in data["counters"].items():
+        metric = _prometheus_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Write the metrics to `path`: Prometheus text for .prom/.txt, else JSON
+def dump(path):
+    text = to_prometheus() if path.endswith((".prom", ".txt")) else to_json()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+# Turn collection on. Optionally dump to `path` at exit (and on SIGUSR1 where
+# available) and run cProfile, writing its stats to `profile_path`.
+def enable(path=None, profile_path=None):
+    _registry.enabled = True
+    if profile_path and _registry.profiler is None:
+        import cProfile
+        _registry.profile_path = profile_path
+        _registry.profiler = cProfile.Profile()
+        _registry.profiler.enable()
+    if path or profile_path:
+        atexit.register(_dump_at_exit, path)
+    if path and hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: _dump_in_background(path))
+
+
+# The handler runs on the main thread, possibly inside observe() or count()
+# with the registry lock held; dumping from another thread lets it wait for
+# the lock instead of deadlocking
+def _dump_in_background(path):
+    threading.Thread(target=dump, args=(path,), name="metrics-dump", daemon=True).start()
+
+
+def _dump_at_exit(path):
+    if _registry.profiler is not None:
+        _registry.profiler.disable()
+        _registry.profiler.dump_stats(_registry.profile_path)
+    if path:
+        dump(path)
+
+
+def disable():
+    _registry.enabled = False
+    if _registry.profiler is not None:
+        _registry.profiler.disable()
+        _registry.profiler = None
+
+
+# QUIZ_METRICS=metrics.json (or .prom) and QUIZ_PROFILE=quiz.prof switch
+# collection on for any entry point without code changes
+if os.environ.get("QUIZ_METRICS") or os.environ.get("QUIZ_PROFILE"):
+    enable(os.environ.get("QUIZ_METRICS") or None, os.environ.get("QUIZ_PROFILE") or None)
@@ -0,0 +1,150 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from collections import OrderedDict
+
+# Named cost presets. Larger scrypt n means more memory and time per hash;
+# "fast" is only meant for tests and load generation.
+COST_LEVELS = {
+    "fast": {"scheme": "scrypt", "n": 2 ** 12, "r": 8, "p": 1},
+    "interactive": {"scheme": "scrypt", "n": 2 ** 14, "r": 8, "p": 1},
+    "moderate": {"scheme": "scrypt", "n": 2 ** 15, "r": 8, "p": 1},
+    "sensitive": {"scheme": "scrypt", "n": 2 ** 17, "r": 8, "p": 1},
+    "pbkdf2": {"scheme": "pbkdf2_sha256", "iterations": 600000},
+}
+DEFAULT_COST = os.environ.get("QUIZ_PASSWORD_COST", "interactive")
+SCHEMES = ("scrypt", "pbkdf2_sha256")
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def is_hashed(stored):
+    return stored.split("$", 1)[0] in SCHEMES
+
+
+# Salted, memory-hard password hashing. Hashes are stored as
+#   scrypt$n$r$p$salt$hash  or  pbkdf2_sha256$iterations$salt$hash
+# so each row records the cost it was made with and can be upgraded later.
+# Rows that are not in either format are legacy plaintext passwords.
+class PasswordHasher:
+    def __init__(self, scheme="scrypt", n=2 ** 14, r=8, p=1, iterations=600000, cache_size=1024):
+        if scheme not in SCHEMES:
+            raise ValueError(f"unknown password scheme: {scheme}")
+        self.scheme = scheme
+        self.n, self.r, self.p = n, r, p
+        self.iterations = iterations
+        # Recently verified passwords, keyed by stored hash. Only a keyed HMAC of
+        # the password is kept, never the password itself.
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_key = secrets.token_bytes(32)
+        self._cache_lock = threading.Lock()
+        self._dummy = None
+
+    @classmethod
+    def from_level(cls, level=DEFAULT_COST, **options):
+        return cls(**COST_LEVELS[level], **options)
+
+    def _scrypt(self, password, salt, n, r, p):
+        # OpenSSL refuses to use more than maxmem bytes; scrypt needs about 128 * n * r
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=HASH_BYTES)
+
+    def _pbkdf2(self, password, salt, iterations):
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, HASH_BYTES)
+
+    def hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        if self.scheme == "scrypt":
+            digest = self._scrypt(password, salt, self.n, self.r, self.p)
+            return f"scrypt${self.n}${self.r}${self.p}${_b64(salt)}${_b64(digest)}"
+        digest = self._pbkdf2(password, salt, self.iterations)
+        return f"pbkdf2_sha256${self.iterations}${_b64(salt)}${_b64(digest)}"
+
+    def _fingerprint(self, password):
+        return hmac.new(self._cache_key, password.encode(), hashlib.sha256).digest()
+
+    def verify(self, password, stored):
+        fingerprint = self._fingerprint(password)
+        with self._cache_lock:
+            cached = self._cache.get(stored)
+            if cached is not None:
+                self._cache.move_to_end(stored)
+        if cached is not None and hmac.compare_digest(cached, fingerprint):
+            return True
+
+        fields = stored.split("$")
+        if fields[0] == "scrypt" and len(fields) == 6:
+            n, r, p = int(fields[1]), int(fields[2]), int(fields[3])
+            ok = hmac.compare_digest(self._scrypt(password, _unb64(fields[4]), n, r, p), _unb64(fields[5]))
+        elif fields[0] == "pbkdf2_sha256" and len(fields) == 4:
+            ok = hmac.compare_digest(self._pbkdf2(password, _unb64(fields[2]), int(fields[1])), _unb64(fields[3]))
+        else:
+            ok = hmac.compare_digest(password.encode(), stored.encode())
+
+        if ok:
+            with self._cache_lock:
+                self._cache[stored] = fingerprint
+                self._cache.move_to_end(stored)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return ok
+
+    # Burn the same time as a real check when the username does not exist
+    def verify_missing(self, password):
+        if self._dummy is None:
+            self._dummy = self.hash(secrets.token_hex(8))
+        fields = self._dummy.split("$")
+        if self.scheme == "scrypt":
+            self._scrypt(password, _unb64(fields[4]), self.n, self.r, self.p)
+        else:
+            self._pbkdf2(password, _unb64(fields[2]), self.iterations)
+        return False
+
+    # True for plaintext rows and hashes made with other cost settings
+    def needs_rehash(self, stored):
+        fields = stored.split("$")
+        if self.scheme == "scrypt":
+            return fields[0] != "scrypt" or fields[1:4] != [str(self.n), str(self.r), str(self.p)]
+        return fields[0] != "pbkdf2_sha256" or fields[1] != str(self.iterations)
+
+
+_default_hasher = None
+
+
+def get_hasher():
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = PasswordHasher.from_level(DEFAULT_COST)
+    return _default_hasher
+
+
+def main(argv=None):
+    from database import DB_PATH, QuizRepository
+
+    parser = argparse.ArgumentParser(description="Hash legacy plaintext passwords in the users table")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--cost", default=DEFAULT_COST, choices=sorted(COST_LEVELS))
+    args = parser.parse_args(argv)
+
+    repository = QuizRepository(args.db, hasher=PasswordHasher.from_level(args.cost))
+    repository.init_schema()
+    upgraded = repository.migrate_passwords()
+    repository.close()
+    print(f"Hashed {upgraded} plaintext password(s) with the '{args.cost}' cost settings")
+
+
+if __name__ == "__main__":
+    main()
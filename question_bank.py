@@ -0,0 +1,202 @@
+import random
+
+from question_cache import CACHE_DIR, QuestionCache
+from quiz_engine import QUESTIONS, Question
+
+CREATE_QUESTIONS = '''CREATE TABLE IF NOT EXISTS questions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        question TEXT NOT NULL,
+                        option1 TEXT,
+                        option2 TEXT,
+                        option3 TEXT,
+                        option4 TEXT,
+                        answer TEXT NOT NULL,
+                        explanation TEXT NOT NULL DEFAULT '',
+                        topic TEXT NOT NULL DEFAULT 'general',
+                        difficulty INTEGER NOT NULL DEFAULT 1,
+                        answer_index INTEGER)'''
+# Columns added since the first version of the table, for in-place upgrades
+ADDED_COLUMNS = (
+    ("explanation", "TEXT NOT NULL DEFAULT ''"),
+    ("topic", "TEXT NOT NULL DEFAULT 'general'"),
+    ("difficulty", "INTEGER NOT NULL DEFAULT 1"),
+    ("answer_index", "INTEGER"),
+)
+# Position (0-3) of the correct option, filled in for rows stored before the
+# column existed; -1 if the answer matches none of the options
+BACKFILL_ANSWER_INDEX = '''UPDATE questions SET answer_index = CASE answer
+                               WHEN option1 THEN 0 WHEN option2 THEN 1
+                               WHEN option3 THEN 2 WHEN option4 THEN 3 ELSE -1 END
+                           WHERE answer_index IS NULL'''
+# Secondary indexes carry the rowid, so "filter AND id >= ? ORDER BY id" is a
+# single index seek for every filter combination
+CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions (topic)",
+    "CREATE INDEX IF NOT EXISTS idx_questions_difficulty ON questions (difficulty)",
+    "CREATE INDEX IF NOT EXISTS idx_questions_topic_difficulty ON questions (topic, difficulty)",
+)
+# The bank version counts changes to the questions table; cached questions
+# are only used for the version they were read at. bank_id tells banks apart
+# in the shared on-disk cache.
+CREATE_META = "CREATE TABLE IF NOT EXISTS bank_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+INIT_META = "INSERT OR IGNORE INTO bank_meta (key, value) VALUES ('version', 0), ('bank_id', abs(random()))"
+CREATE_VERSION_TRIGGERS = tuple(
+    f'''CREATE TRIGGER IF NOT EXISTS questions_version_{event.lower()} AFTER {event} ON questions
+        BEGIN UPDATE bank_meta SET value = value + 1 WHERE key = 'version'; END'''
+    for event in ("INSERT", "UPDATE", "DELETE"))
+SELECT_VERSION = "SELECT value FROM bank_meta WHERE key = 'version'"
+SELECT_BANK_ID = "SELECT value FROM bank_meta WHERE key = 'bank_id'"
+INSERT_QUESTION = '''INSERT INTO questions (question, option1, option2, option3, option4,
+                                            answer, explanation, topic, difficulty, answer_index)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+SET_ANSWER = "UPDATE questions SET answer = ?, answer_index = ? WHERE id = ?"
+COLUMNS = "id, question, option1, option2, option3, option4, answer, explanation, topic, difficulty, answer_index"
+
+# Random probes per requested question before falling back to listing ids
+PROBES_PER_QUESTION = 8
+
+
+def question_row(data):
+    options = list(data["options"]) + [None] * (4 - len(data["options"]))
+    answer = data["answer"]
+    answer_index = options.index(answer) if answer in options[:4] else -1
+    return (data["question"], *options[:4], answer, data.get("explanation", ""),
+            data.get("topic") or "general", data.get("difficulty") or 1, answer_index)
+
+
+def row_to_question(row):
+    qid, text, o1, o2, o3, o4, answer, explanation, topic, difficulty, answer_index = row
+    options = [option for option in (o1, o2, o3, o4) if option is not None]
+    return Question(text, options, answer, explanation, qid, topic, difficulty, answer_index)
+
+
+# Questions stored in SQLite, indexed by topic and difficulty. sample() reads
+# only the k rows it returns, so starting a quiz costs the same for a bank of
+# twenty questions or a million. Parsed questions are cached (see
+# QuestionCache); a quiz drawn from cached questions reads only their ids.
+class QuestionBank:
+    def __init__(self, repository, rng=None, cache=None):
+        self.repository = repository
+        self.rng = rng or random.Random()
+        self.cache = cache or QuestionCache()
+
+    def init_schema(self, seed=QUESTIONS):
+        with self.repository.transaction() as conn:
+            conn.execute(CREATE_QUESTIONS)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(questions)")}
+            for name, definition in ADDED_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE questions ADD COLUMN {name} {definition}")
+            for statement in CREATE_INDEXES:
+                conn.execute(statement)
+            if "answer_index" not in existing:
+                conn.execute(BACKFILL_ANSWER_INDEX)
+            conn.execute(CREATE_META)
+            conn.execute(INIT_META)
+            for statement in CREATE_VERSION_TRIGGERS:
+                conn.execute(statement)
+            if seed and conn.execute("SELECT 1 FROM questions LIMIT 1").fetchone() is None:
+                conn.executemany(INSERT_QUESTION, (question_row(data) for data in seed))
+
+    def add_questions(self, questions):
+        with self.repository.transaction() as conn:
+            conn.executemany(INSERT_QUESTION, (question_row(data) for data in questions))
+
+    # Correct a question's answer key; stored results can then be re-scored
+    # with regrade.regrade_results()
+    def set_answer(self, question_id, option_index):
+        question = self.get(question_id)
+        if question is None or not 0 <= option_index < len(question.options):
+            raise ValueError(f"no option {option_index} for question {question_id}")
+        with self.repository.transaction() as conn:
+            conn.execute(SET_ANSWER, (question.options[option_index], option_index, question_id))
+
+    def count(self, topic=None, difficulty=None):
+        where, params = self._filter(topic, difficulty)
+        with self.repository.reader() as conn:
+            return conn.execute(f"SELECT count(*) FROM questions{where}", params).fetchone()[0]
+
+    def get(self, question_id):
+        with self.repository.reader() as conn:
+            questions = self._load(conn, conn.execute(SELECT_VERSION).fetchone()[0], [question_id])
+        return questions[0] if questions else None
+
+    def version(self):
+        with self.repository.reader() as conn:
+            return conn.execute(SELECT_VERSION).fetchone()[0]
+
+    # Questions for `ids`, in that order, from the cache or else in one query.
+    # The version must be read before the rows, so rows are never older than
+    # the version they are cached under.
+    def _load(self, conn, version, ids):
+        found = self.cache.lookup(version, ids)
+        missing = [question_id for question_id in ids if question_id not in found]
+        if missing:
+            placeholders = ", ".join("?" * len(missing))
+            loaded = [row_to_question(row) for row in
+                      conn.execute(f"SELECT {COLUMNS} FROM questions WHERE id IN ({placeholders})", missing)]
+            self.cache.store(version, loaded)
+            found.update((question.id, question) for question in loaded)
+        return [found[question_id] for question_id in ids if question_id in found]
+
+    # Warm the cache from the shared on-disk copy another instance saved for
+    # this bank and version; returns the number of questions read
+    def load_shared_cache(self, directory=CACHE_DIR):
+        if not directory:
+            return 0
+        with self.repository.reader() as conn:
+            version = conn.execute(SELECT_VERSION).fetchone()[0]
+            bank_id = conn.execute(SELECT_BANK_ID).fetchone()[0]
+        return self.cache.load(directory, bank_id, version)
+
+    def save_shared_cache(self, directory=CACHE_DIR):
+        if not directory:
+            return None
+        with self.repository.reader() as conn:
+            version = conn.execute(SELECT_VERSION).fetchone()[0]
+            bank_id = conn.execute(SELECT_BANK_ID).fetchone()[0]
+        return self.cache.save(directory, bank_id, version)
+
+    def _filter(self, topic, difficulty):
+        clauses, params = [], []
+        if topic is not None:
+            clauses.append("topic = ?")
+            params.append(topic)
+        if difficulty is not None:
+            clauses.append("difficulty = ?")
+            params.append(difficulty)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    # Pick k distinct questions by probing random rowids between the smallest
+    # and largest matching id. Each probe is one index seek; rows that follow
+    # gaps in the id sequence are slightly favoured, which is fine for quizzes.
+    def sample(self, k, topic=None, difficulty=None):
+        where, params = self._filter(topic, difficulty)
+        probe_where = (where + " AND " if where else " WHERE ") + "id >= ?"
+        picked = {}
+        with self.repository.reader() as conn:
+            version = conn.execute(SELECT_VERSION).fetchone()[0]
+            # ORDER BY ... LIMIT 1 seeks the ends of the index range; min()/max()
+            # with a filter would scan every matching entry
+            first = conn.execute(f"SELECT id FROM questions{where} ORDER BY id LIMIT 1", params).fetchone()
+            if first is None:
+                return []
+            last = conn.execute(f"SELECT id FROM questions{where} ORDER BY id DESC LIMIT 1", params).fetchone()
+            low, high = first[0], last[0]
+            # Ids only: the rows come from the cache or one query at the end
+            probe = f"SELECT id FROM questions{probe_where} ORDER BY id LIMIT 1"
+            for _ in range(k * PROBES_PER_QUESTION):
+                if len(picked) == k:
+                    break
+                row = conn.execute(probe, (*params, self.rng.randint(low, high))).fetchone()
+                if row is not None:
+                    picked.setdefault(row[0])
+            if len(picked) < k:
+                # Small or sparse selection: list the matching ids and sample those
+                ids = [row[0] for row in conn.execute(f"SELECT id FROM questions{where}", params)]
+                missing = [qid for qid in ids if qid not in picked]
+                for qid in self.rng.sample(missing, min(k - len(picked), len(missing))):
+                    picked.setdefault(qid)
+            questions = self._load(conn, version, list(picked))
+        self.rng.shuffle(questions)
+        return questions
@@ -0,0 +1,138 @@
+import glob
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+from quiz_engine import Question
+
+# Parsed questions kept per QuestionBank; QUIZ_QUESTION_CACHE=0 turns it off
+CACHE_SIZE = int(os.environ.get("QUIZ_QUESTION_CACHE", "5000"))
+# Directory for the cache shared between app instances on one machine; unset
+# means no shared cache
+CACHE_DIR = os.environ.get("QUIZ_QUESTION_CACHE_DIR")
+
+
+# Least-recently-used cache of Question objects by id, for one bank version.
+# The bank's version goes up with every insert, update or delete on the
+# questions table, so a lookup or store for a newer version empties the cache
+# instead of serving questions that were edited since. Questions are never
+# modified after loading and are shared between sessions.
+class QuestionCache:
+    def __init__(self, capacity=CACHE_SIZE):
+        self.capacity = capacity
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Must hold _lock. Returns False for a version older than the cached one,
+    # e.g. rows read by a thread that started before an edit.
+    def _use_version(self, version):
+        if version == self.version:
+            return True
+        if self.version is not None and version < self.version:
+            return False
+        if self._entries:
+            self.invalidations += 1
+            metrics.count("questions.cache_invalidation")
+        self._entries.clear()
+        self.version = version
+        return True
+
+    # The cached questions among `ids`, as {id: question}
+    def lookup(self, version, ids):
+        found = {}
+        with self._lock:
+            if self._use_version(version):
+                for question_id in ids:
+                    question = self._entries.get(question_id)
+                    if question is not None:
+                        self._entries.move_to_end(question_id)
+                        found[question_id] = question
+            self.hits += len(found)
+            self.misses += len(ids) - len(found)
+        metrics.count("questions.cache_hit", len(found))
+        metrics.count("questions.cache_miss", len(ids) - len(found))
+        return found
+
+    def store(self, version, questions):
+        with self._lock:
+            if not self._use_version(version):
+                return
+            for question in questions:
+                self._entries[question.id] = question
+                self._entries.move_to_end(question.id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.version = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    # Shared cache: the cached questions of one bank version as a JSON file.
+    # Another instance starting on the same bank and version reads the file
+    # instead of loading every question from the database again.
+    def save(self, directory, bank_id, version):
+        with self._lock:
+            if version != self.version:
+                return None
+            questions = [question_dict(question) for question in self._entries.values()]
+        os.makedirs(directory, exist_ok=True)
+        path = shared_path(directory, bank_id, version)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"bank_id": bank_id, "version": version, "questions": questions}, f)
+        # Readers see the old file or the new one, never half of it
+        os.replace(temp, path)
+        # Files of earlier versions can never be used again
+        for stale in glob.glob(os.path.join(directory, f"questions-{bank_id}-*.json")):
+            if stale != path:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+        return path
+
+    # Number of questions read from the shared cache, 0 if there is none
+    def load(self, directory, bank_id, version):
+        try:
+            with open(shared_path(directory, bank_id, version), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get("bank_id") != bank_id or data.get("version") != version:
+            return 0
+        questions = [Question.from_dict(item) for item in data["questions"][-self.capacity:]]
+        self.store(version, questions)
+        return len(questions)
+
+
+def shared_path(directory, bank_id, version):
+    return os.path.join(directory, f"questions-{bank_id}-{version}.json")
+
+
+def question_dict(question):
+    return {"id": question.id, "question": question.text, "options": list(question.options),
+            "answer": question.answer, "answer_index": question.answer_index,
+            "explanation": question.explanation, "topic": question.topic, "difficulty": question.difficulty}
@@ -0,0 +1,376 @@
+import itertools
+import random
+from array import array
+
+import metrics
+
+QUESTIONS_PER_QUIZ = 5
+PASS_MARK = 3
+MIN_CREDENTIAL_LENGTH = 6
+
+
+# Shared login/registration input rules; returns an error message or None
+def validate_credentials(username, password):
+    if not username or not password:
+        return "Username and password cannot be empty."
+    if not isinstance(username, str) or not isinstance(password, str):
+        return "Username and password must be text."
+    if len(username) < MIN_CREDENTIAL_LENGTH or len(password) < MIN_CREDENTIAL_LENGTH:
+        return "Username and password must be more than 5 characters."
+    return None
+
+# Seed questions with explanations, imported into the question bank on first run
+QUESTIONS = [
+    {"question": "What is the output of print(2 ** 3)?",
+    "options": ["6", "8", "9", "10"],
+    "answer": "8",
+    "explanation": "The ** operator in Python is used for exponentiation. So, 2 ** 3 means 2 raised to the power of 3, which equals 8.",
+    "topic": "python",
+    "difficulty": 1},
+
+    {"question": "Which of the following is not a programming language?",
+    "options": ["Python", "Java", "HTML", "C#"],
+    "answer": "HTML",
+    "explanation": "HTML is a markup language used to structure web content, but it is not a programming language.",
+    "topic": "general",
+    "difficulty": 1},
+
+    {"question": "What does HTML stand for?",
+    "options": ["Hypertext Markup Language", "Hightext Machine Language", "Hyperloop Machine Language", "None of the above"],
+    "answer": "Hypertext Markup Language",
+    "explanation": "HTML stands for Hypertext Markup Language, which is used to create the structure of web pages.",
+    "topic": "web",
+    "difficulty": 1},
+
+    {"question": "Which symbol is used for comments in Python?",
+    "options": ["//", "#", "/*", "<!--"],
+    "answer": "#",
+    "explanation": "The # symbol is used to create comments in Python.",
+    "topic": "python",
+    "difficulty": 1},
+
+    {"question": "What is the correct file extension for Python files?",
+    "options": [".py", ".pt", ".pyt", ".pyth"],
+    "answer": ".py",
+    "explanation": "Python files have the .py extension.",
+    "topic": "python",
+    "difficulty": 1},
+
+    {"question": "Which company developed Java?",
+    "options": ["Microsoft", "Sun Microsystems", "Apple", "Oracle"],
+    "answer": "Sun Microsystems",
+    "explanation": "Java was developed by Sun Microsystems, which was later acquired by Oracle.",
+    "topic": "general",
+    "difficulty": 2},
+
+    {"question": "Which of the following is a Python framework?",
+    "options": ["Flask", "Django", "Both", "None"],
+    "answer": "Both",
+    "explanation": "Flask and Django are popular web frameworks for building applications in Python.",
+    "topic": "python",
+    "difficulty": 2},
+
+    {"question": "What does CSS stand for?",
+    "options": ["Creative Style Sheets", "Colorful Style Sheets", "Computer Style Sheets", "Cascading Style Sheets"],
+    "answer": "Cascading Style Sheets",
+    "explanation": "CSS stands for Cascading Style Sheets and is used to style the layout of web pages.",
+    "topic": "web",
+    "difficulty": 1},
+
+    {"question": "Which of the following is a correct variable name in Python?",
+    "options": ["myVar", "my-var", "my var", "my.var"],
+    "answer": "myVar",
+    "explanation": "Variable names in Python cannot contain spaces, dashes, or dots. Only alphanumeric characters and underscores are allowed.",
+    "topic": "python",
+    "difficulty": 2},
+
+    {"question": "What does SQL stand for?",
+    "options": ["Structured Query Language", "Structured Question Language", "Style Query Language", "None of the above"],
+    "answer": "Structured Query Language",
+    "explanation": "SQL stands for Structured Query Language and is used to communicate with databases.",
+    "topic": "general",
+    "difficulty": 1},
+
+    {"question": "Which of the following is not a data type in Python?",
+    "options": ["List", "Tuple", "Dictionary", "Character"],
+    "answer": "Character",
+    "explanation": "Python does not have a character data type; single characters are treated as strings of length 1.",
+    "topic": "python",
+    "difficulty": 2},
+
+    {"question": "What keyword is used to define a function in Python?",
+    "options": ["define", "function", "def", "fun"],
+    "answer": "def",
+    "explanation": "The def keyword is used to define a function in Python.",
+    "topic": "python",
+    "difficulty": 1},
+
+    {"question": "Which of the following is used to handle exceptions in Python?",
+    "options": ["try", "catch", "finally", "all of the above"],
+    "answer": "all of the above",
+    "explanation": "In Python, try, except, and finally blocks are used to handle exceptions.",
+    "topic": "python",
+    "difficulty": 3},
+
+    {"question": "Which operator is used to compare two values in Python?",
+    "options": ["==", "=", "===", "!="],
+    "answer": "==",
+    "explanation": "The == operator checks if two values are equal, while = is used for assignment.",
+    "topic": "python",
+    "difficulty": 1},
+
+    {"question": "What is the main purpose of a loop in programming?",
+    "options": ["To repeat a block of code", "To perform conditional checks", "To define variables", "To store data"],
+    "answer": "To repeat a block of code",
+    "explanation": "A loop allows you to repeat a block of code multiple times.",
+    "topic": "general",
+    "difficulty": 1},
+
+    {"question": "Which keyword is used to exit a loop in Python?",
+    "options": ["exit", "break", "stop", "end"],
+    "answer": "break",
+    "explanation": "The break keyword is used to exit a loop prematurely.",
+    "topic": "python",
+    "difficulty": 1},
+
+    {"question": "What does API stand for?",
+    "options": ["Application Programming Interface", "Application Protocol Interface", "Advanced Programming Interface", "None of the above"],
+    "answer": "Application Programming Interface",
+    "explanation": "API stands for Application Programming Interface, which allows different software systems to communicate with each other.",
+    "topic": "general",
+    "difficulty": 1},
+
+    {"question": "Which method is used to add an element to the end of a list in Python?",
+    "options": ["add()", "append()", "insert()", "extend()"],
+    "answer": "append()",
+    "explanation": "The append() method is used to add an element to the end of a list.",
+    "topic": "python",
+    "difficulty": 1},
+
+    {"question": "What is the correct syntax to create a variable in Python?",
+    "options": ["variable_name = value", "create variable_name = value", "var variable_name = value", "None of the above"],
+    "answer": "variable_name = value",
+    "explanation": "In Python, variables are created by assigning a value using the = operator.",
+    "topic": "python",
+    "difficulty": 1},
+
+    {"question": "Which of the following is used to import modules in Python?",
+    "options": ["import module_name", "require module_name", "include module_name", "load module_name"],
+    "answer": "import module_name",
+    "explanation": "The import keyword is used to include external modules or libraries in Python.",
+    "topic": "python",
+    "difficulty": 1}
+]
+
+
+
+# A single multiple-choice question. Sessions share these objects, so the
+# pool is built once no matter how many quizzes are running. The position of
+# the correct option is worked out once, so grading compares two integers.
+class Question:
+    __slots__ = ("id", "text", "options", "answer", "answer_index", "explanation", "topic", "difficulty")
+
+    def __init__(self, text, options, answer, explanation="", id=None, topic=None, difficulty=None,
+                 answer_index=None):
+        self.id = id
+        self.text = text
+        self.options = tuple(options)
+        self.answer = answer
+        if answer_index is None:
+            answer_index = self.option_index(answer)
+        self.answer_index = answer_index
+        self.explanation = explanation
+        self.topic = topic
+        self.difficulty = difficulty
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["question"], data["options"], data["answer"], data.get("explanation", ""),
+                   data.get("id"), data.get("topic"), data.get("difficulty"), data.get("answer_index"))
+
+    # Position of `option` among the options, or -1 (also used for "no answer")
+    def option_index(self, option):
+        try:
+            return self.options.index(option)
+        except ValueError:
+            return -1
+
+    def is_correct(self, selected_option):
+        return self.option_index(selected_option) == self.answer_index
+
+
+# One submitted answer, built from a session's responses when results are
+# shown; the question text and explanation are never copied
+class Answer:
+    __slots__ = ("question", "option_index")
+
+    def __init__(self, question, option_index):
+        self.question = question
+        self.option_index = option_index
+
+    @property
+    def selected_option(self):
+        if 0 <= self.option_index < len(self.question.options):
+            return self.question.options[self.option_index]
+        return ""
+
+    @property
+    def correct_answer(self):
+        return self.question.answer
+
+    @property
+    def explanation(self):
+        return self.question.explanation
+
+    @property
+    def is_correct(self):
+        return self.option_index == self.question.answer_index
+
+
+# State and grading for one user's quiz, independent of any UI. Responses are
+# kept as a flat int32 array of question id, option index pairs. An optional
+# listener is told about every graded answer (see adaptive.QuestionStats).
+class QuizSession:
+    __slots__ = ("session_id", "username", "questions", "current_question_index", "score", "responses",
+                 "listener")
+
+    def __init__(self, session_id, username, questions, listener=None):
+        self.session_id = session_id
+        self.username = username
+        self.questions = questions
+        self.current_question_index = 0
+        self.score = 0
+        self.responses = array("i")
+        self.listener = listener
+
+    @property
+    def total(self):
+        return len(self.questions)
+
+    @property
+    def current_question(self):
+        if self.current_question_index < len(self.questions):
+            return self.questions[self.current_question_index]
+        return None
+
+    @property
+    def finished(self):
+        return self.current_question_index >= self.total
+
+    @property
+    def is_first(self):
+        return self.current_question_index == 0
+
+    @property
+    def is_last(self):
+        return self.current_question_index == len(self.questions) - 1
+
+    @property
+    def progress(self):
+        return (self.current_question_index / self.total) * 100
+
+    @property
+    def passed(self):
+        return self.score >= PASS_MARK
+
+    @property
+    def answered(self):
+        return len(self.responses) // 2
+
+    # Submitted answers joined with their questions, in the order given
+    @property
+    def user_answers(self):
+        by_id = {q.id: q for q in self.questions}
+        pairs = self.responses
+        return [Answer(by_id[pairs[i]], pairs[i + 1]) for i in range(0, len(pairs), 2)]
+
+    def previous(self):
+        if self.current_question_index > 0:
+            self.current_question_index -= 1
+            return True
+        return False
+
+    def next(self):
+        if self.current_question_index < len(self.questions) - 1:
+            self.current_question_index += 1
+            return True
+        return False
+
+    # Grade the chosen option (-1 for none) for the current question and move
+    # on. The session is fully updated before the listener hears about the
+    # answer, so a failing listener can never get an answer counted twice.
+    def submit_index(self, option_index):
+        question = self.questions[self.current_question_index]
+        # Checked first: responses must always hold whole pairs
+        if not -1 <= option_index < len(question.options):
+            raise ValueError(f"no option {option_index} for question {question.id}")
+        self.responses.append(question.id)
+        self.responses.append(option_index)
+        correct = option_index == question.answer_index
+        if correct:
+            self.score += 1
+        self.current_question_index += 1
+        if self.listener is not None:
+            try:
+                self.listener.answered(self, question, correct)
+            except Exception:
+                # Statistics are best effort; the answer stands
+                metrics.count("quiz.listener_error")
+        return correct
+
+    # Same, for callers that have the option text
+    def submit(self, selected_option):
+        return self.submit_index(self.questions[self.current_question_index].option_index(selected_option))
+
+
+# Creates and tracks quiz sessions; many sessions can run in one process.
+# Questions come from a question bank when one is given (anything with a
+# sample(k) method), otherwise from an in-memory pool.
+class QuizEngine:
+    def __init__(self, questions=None, questions_per_quiz=QUESTIONS_PER_QUIZ, rng=None, bank=None, listener=None):
+        if questions is None and bank is None:
+            questions = QUESTIONS
+        self.questions = tuple(q if isinstance(q, Question) else Question.from_dict(q) for q in questions or ())
+        # Responses refer to questions by id; number any that have none in pool
+        # order, which matches the ids the seed questions get in the bank
+        for number, question in enumerate(self.questions, start=1):
+            if question.id is None:
+                question.id = number
+        self.bank = bank
+        self.listener = listener
+        self.questions_per_quiz = questions_per_quiz
+        self.rng = rng or random.Random()
+        self.sessions = {}
+        self._ids = itertools.count(1)
+
+    def select_questions(self):
+        if self.bank is not None:
+            return self.bank.sample(self.questions_per_quiz)
+        # Sample only the questions needed instead of shuffling the whole pool
+        k = min(self.questions_per_quiz, len(self.questions))
+        return self.rng.sample(self.questions, k)
+
+    def start_session(self, username=None):
+        session = QuizSession(next(self._ids), username, self.select_questions(), self.listener)
+        self.sessions[session.session_id] = session
+        return session
+
+    # Rebuild a saved session from its questions and (question index, option
+    # index) answers. The answers were reported to the listener the first time,
+    # so it is only attached once they have been replayed.
+    def restore_session(self, username, questions, answers, current_index=None):
+        session = QuizSession(next(self._ids), username, list(questions))
+        for index, option in answers:
+            session.current_question_index = index
+            session.submit_index(option)
+        if current_index is not None:
+            session.current_question_index = current_index
+        session.listener = self.listener
+        self.sessions[session.session_id] = session
+        return session
+
+    def get_session(self, session_id):
+        return self.sessions.get(session_id)
+
+    def end_session(self, session_id):
+        return self.sessions.pop(session_id, None)
@@ -0,0 +1,105 @@
+import argparse
+import time
+
+import numpy as np
+
+from database import DB_PATH, QuizRepository
+from question_bank import QuestionBank
+
+BATCH_SIZE = 100000
+UPDATE_SCORE = "UPDATE results SET score = ? WHERE id = ?"
+
+
+# Correct option index for every question id, as an array indexed by id.
+# Ids without a question map to -1, which no response can match.
+def answer_key(repository):
+    with repository.reader() as conn:
+        rows = conn.execute("SELECT id, coalesce(answer_index, -1) FROM questions").fetchall()
+    if not rows:
+        return np.full(1, -1, dtype=np.int32)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    key = np.full(int(ids.max()) + 1, -1, dtype=np.int32)
+    key[ids] = np.fromiter((row[1] for row in rows), dtype=np.int32, count=len(rows))
+    return key
+
+
+# Score many results at once. `pairs` is an (n, 2) array of (question id,
+# option index) rows for all results back to back and `lengths` the number of
+# rows belonging to each result, in order.
+def score_responses(key, pairs, lengths):
+    question_ids, options = pairs[:, 0], pairs[:, 1]
+    expected = np.full(len(question_ids), -1, dtype=np.int32)
+    known = (question_ids >= 0) & (question_ids < len(key))
+    expected[known] = key[question_ids[known]]
+    correct = (options == expected) & (options >= 0)
+    # Per-result sums from one running total, which also copes with empty results
+    running = np.concatenate(([0], np.cumsum(correct, dtype=np.int64)))
+    ends = np.cumsum(lengths)
+    return running[ends] - running[ends - lengths]
+
+
+# Re-score every stored result against the current answer key, a batch of
+# results at a time, and write back only the scores that changed. The
+# aggregate tables follow through the results_stats_update trigger.
+def regrade_results(repository, batch_size=BATCH_SIZE, key=None):
+    key = answer_key(repository) if key is None else key
+    start = time.perf_counter()
+    last_id = 0
+    checked = changed = 0
+    while True:
+        with repository.reader() as conn:
+            rows = conn.execute('''SELECT id, score, responses FROM results
+                                   WHERE id > ? AND responses IS NOT NULL ORDER BY id LIMIT ?''',
+                                (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        blobs = [row[2] for row in rows]
+        pairs = np.frombuffer(b"".join(blobs), dtype="<i4").reshape(-1, 2)
+        lengths = np.fromiter((len(blob) // 8 for blob in blobs), dtype=np.int64, count=len(rows))
+        scores = score_responses(key, pairs, lengths)
+        old = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        different = np.nonzero(scores != old)[0]
+        if len(different):
+            with repository.transaction() as conn:
+                conn.executemany(UPDATE_SCORE, zip(scores[different].tolist(), ids[different].tolist()))
+        checked += len(rows)
+        changed += len(different)
+    elapsed = time.perf_counter() - start
+    return {"results": checked, "changed": changed, "seconds": elapsed,
+            "results_per_second": checked / elapsed if elapsed else 0.0}
+
+
+def parse_correction(text):
+    question_id, _, option_index = text.partition("=")
+    try:
+        return int(question_id), int(option_index)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected QUESTION_ID=OPTION_INDEX, got {text!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Correct answer keys and re-score stored results")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--set", dest="corrections", metavar="QUESTION_ID=OPTION_INDEX", action="append",
+                        type=parse_correction, default=[], help="make option OPTION_INDEX (0-3) the right answer")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    repository = QuizRepository(args.db)
+    repository.init_schema()
+    bank = QuestionBank(repository)
+    bank.init_schema()
+    try:
+        for question_id, option_index in args.corrections:
+            bank.set_answer(question_id, option_index)
+        stats = regrade_results(repository, args.batch_size)
+    finally:
+        repository.close()
+    print(f"Re-scored {stats['results']:,} results in {stats['seconds']:.2f}s "
+          f"({stats['results_per_second']:,.0f}/s); {stats['changed']:,} scores changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import glob
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import metrics
+from database import pack_responses
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Exact journal file to use; must not be shared by two running processes.
+# By default every process gets its own (see journal_paths).
+JOURNAL_PATH = os.environ.get("QUIZ_RESULT_JOURNAL")
+# The single journal older versions used whatever the database
+LEGACY_JOURNAL_PATH = "quiz_results.journal"
+HOST = re.sub(r"[^A-Za-z0-9_.-]", "_", socket.gethostname())
+
+
+# This process's journal for results bound for `repository` (a
+# QuizRepository or a ShardRouter), and glob patterns for the journals other
+# processes keep for the same database. Journals sit next to the database,
+# so results are never replayed into a different one, and are named by host
+# and process, so a lab of machines sharing one database file never share a
+# journal.
+def journal_paths(repository):
+    if JOURNAL_PATH:
+        return JOURNAL_PATH, ()
+    base = repository.journal_path
+    stem = base[:-len(".journal")] if base.endswith(".journal") else base
+    own = f"{stem}.{HOST}-{os.getpid()}.journal"
+    return own, (glob.escape(stem) + ".*.journal", glob.escape(base))
+
+
+# Exclusive lock on an open journal without waiting; False if another
+# process holds it. Released when the file is closed or the process dies.
+def lock_journal(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def read_journal(f):
+    entries = {}
+    for line in f:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # A half-written last line from a crash
+            continue
+        entries[entry["ref"]] = entry
+    return entries
+
+
+# Write-behind buffer for quiz results. add() appends the result to a local
+# journal file and an in-memory queue and returns straight away; a background
+# thread writes queued results to the results table in batched transactions.
+# If the database is locked the batch is retried later, and anything still
+# unwritten when the process dies is replayed from the journal on the next
+# start. Every result has a client reference, so a batch that was committed
+# just before a crash is not inserted twice. Each process writes its own
+# journal and holds a lock on it while running; start() also takes over the
+# journals of processes that died (any sibling journal nobody holds a lock
+# on). A journal is emptied whenever everything in it has been written, and
+# removed on a clean close.
+class ResultBuffer:
+    def __init__(self, repository, journal=None, batch_size=200, interval=0.5, sync=True):
+        self.repository = repository
+        if journal is None:
+            self.journal_path, self.orphan_patterns = journal_paths(repository)
+        else:
+            self.journal_path, self.orphan_patterns = journal, ()
+        self.batch_size = batch_size
+        # Seconds to wait for more results before writing a partial batch
+        self.interval = interval
+        # fsync each journal line; without it a power cut can lose the last results
+        self.sync = sync
+        self._queue = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # Held while a batch is written, so flush() and the thread never overlap
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._thread = None
+        self._stopping = False
+        self._retry_delay = interval
+
+    # Open and lock this process's journal. Another process may be taking
+    # over the file as an orphan between open() and the lock and remove it;
+    # then the lock is on a removed file and the open is repeated.
+    def _open_journal(self):
+        while self._journal is None:
+            directory = os.path.dirname(os.path.abspath(self.journal_path))
+            os.makedirs(directory, exist_ok=True)
+            journal = open(self.journal_path, "a+", encoding="utf-8")
+            if not lock_journal(journal):
+                journal.close()
+                raise RuntimeError(f"result journal {self.journal_path} is in use by another process")
+            try:
+                current = os.path.samestat(os.fstat(journal.fileno()), os.stat(self.journal_path))
+            except FileNotFoundError:
+                current = False
+            if current:
+                self._journal = journal
+            else:
+                journal.close()
+        return self._journal
+
+    # Results this process's journal already holds, e.g. from an earlier
+    # process with the same id
+    def _read_journal(self):
+        journal = self._open_journal()
+        journal.seek(0)
+        entries = read_journal(journal)
+        journal.seek(0, os.SEEK_END)
+        return entries
+
+    # Move the results of dead processes' journals into ours, then remove
+    # those files. A journal that is still locked belongs to a running
+    # process and is left alone.
+    def _adopt_orphans(self):
+        own = os.path.abspath(self.journal_path)
+        adopted = {}
+        for pattern in self.orphan_patterns:
+            for path in sorted(glob.glob(pattern)):
+                if os.path.abspath(path) == own:
+                    continue
+                try:
+                    orphan = open(path, encoding="utf-8")
+                except OSError:
+                    continue
+                with orphan:
+                    if not lock_journal(orphan):
+                        continue
+                    orphan.seek(0)
+                    entries = read_journal(orphan)
+                    if entries:
+                        journal = self._open_journal()
+                        journal.writelines(json.dumps(entry) + "\n" for entry in entries.values())
+                        journal.flush()
+                        os.fsync(journal.fileno())
+                        adopted.update(entries)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        if adopted:
+            metrics.count("results.adopted", len(adopted))
+        return adopted
+
+    # Queue journaled results from earlier runs and start the writer thread
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return len(self._queue)
+            entries = self._read_journal()
+            entries.update(self._adopt_orphans())
+            self._queue.extend(entries.values())
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="quiz-results", daemon=True)
+            self._thread.start()
+            self._wake.notify()
+            return len(self._queue)
+
+    def add(self, username, score, responses=None):
+        entry = {
+            "ref": uuid.uuid4().hex,
+            "username": username,
+            "score": score,
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "responses": list(responses) if responses is not None else None,
+        }
+        line = json.dumps(entry) + "\n"
+        with metrics.timer("results.journal"), self._lock:
+            journal = self._open_journal()
+            journal.write(line)
+            journal.flush()
+            if self.sync:
+                os.fsync(journal.fileno())
+            self._queue.append(entry)
+            self._wake.notify()
+        return entry["ref"]
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    # Write up to one batch; returns the number of results handed to the database
+    def _write_batch(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = self._queue[:self.batch_size]
+            if not batch:
+                return 0
+            rows = [(e["username"], e["score"], e["created_at"], e["ref"], pack_responses(e.get("responses")))
+                    for e in batch]
+            with metrics.timer("results.flush"):
+                self.repository.save_journaled_results(rows)
+            with self._lock:
+                del self._queue[:len(batch)]
+                # Every journaled result is now in the database, so the journal can
+                # start over. add() holds the same lock, so nothing slips in between.
+                if not self._queue:
+                    self._truncate_journal()
+        metrics.count("results.flushed", len(batch))
+        return len(batch)
+
+    # Empty our own journal, keeping it open so the lock stays held
+    def _truncate_journal(self):
+        journal = self._open_journal()
+        journal.seek(0)
+        journal.truncate()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._queue and not self._stopping:
+                    self._wake.wait()
+                elif len(self._queue) < self.batch_size and not self._stopping:
+                    # Give a partial batch a moment to fill up
+                    self._wake.wait(self.interval)
+                if self._stopping:
+                    return
+            try:
+                self._write_batch()
+                self._retry_delay = self.interval
+            except sqlite3.Error:
+                # Locked or busy: keep the results and try again a little later,
+                # backing off so a crowded database is not hammered
+                metrics.count("results.retry")
+                with self._lock:
+                    if not self._stopping:
+                        self._wake.wait(self._retry_delay)
+                self._retry_delay = min(self._retry_delay * 2, 30.0)
+
+    # Write everything queued now, on the calling thread. Returns False if the
+    # database could not be written; the results stay in the journal.
+    def flush(self):
+        try:
+            while self._write_batch():
+                pass
+        except sqlite3.Error:
+            return False
+        return True
+
+    def close(self):
+        with self._lock:
+            self._stopping = True
+            self._wake.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self.flush()
+        with self._lock:
+            if self._journal is not None:
+                empty = self._journal.seek(0, os.SEEK_END) == 0
+                self._journal.close()
+                self._journal = None
+                # Nothing left to write: no file for the next start to take over
+                if empty:
+                    try:
+                        os.remove(self.journal_path)
+                    except OSError:
+                        pass
@@ -0,0 +1,359 @@
+import argparse
+import asyncio
+import json
+import logging
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+from database import DB_PATH, QuizRepository
+from login_throttle import LoginThrottle, LoginThrottled
+from passwords import COST_LEVELS, DEFAULT_COST, PasswordHasher
+from adaptive import AdaptiveQuizEngine, QuestionStats
+from question_bank import QuestionBank
+from quiz_engine import QuizEngine, validate_credentials
+
+MAX_BODY = 64 * 1024
+# Sessions unused for this many seconds are dropped, logged out or not
+SESSION_TTL = 3600.0
+
+log = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Serves the quiz over HTTP/JSON. Quiz sessions live in memory on the event
+# loop; every SQLite call is handed to a thread pool so a slow or locked
+# database never stalls the other students.
+class QuizServer:
+    def __init__(self, repository=None, engine=None, db_workers=4, adaptive=False, throttle=None,
+                 session_ttl=SESSION_TTL):
+        self.repository = repository or QuizRepository(DB_PATH, pool_size=db_workers)
+        self.bank = QuestionBank(self.repository)
+        self.stats = QuestionStats(self.repository)
+        self.adaptive = adaptive
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="quiz-db")
+        self.tokens = {}
+        # Session id -> time.monotonic() of its last request, for expiry
+        self.last_used = {}
+        self.session_ttl = session_ttl
+        self._next_sweep = time.monotonic() + session_ttl / 10
+        # One answer at a time per session: grading runs in the thread pool
+        self.answer_locks = {}
+        # Login attempts are limited per username and per client address
+        self.throttle = throttle or LoginThrottle()
+        self.routes = {
+            ("POST", "/register"): self.register,
+            ("POST", "/login"): self.login,
+            ("POST", "/logout"): self.logout,
+            ("GET", "/question"): self.question,
+            ("POST", "/answer"): self.answer,
+            ("GET", "/results"): self.results,
+            ("GET", "/metrics"): self.metrics,
+        }
+
+    async def run_db(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def start(self):
+        await self.run_db(self.repository.init_schema)
+        await self.run_db(self.bank.init_schema)
+        await self.run_db(self.stats.init_schema)
+        await self.run_db(self.bank.load_shared_cache)
+        if self.engine is None:
+            if self.adaptive:
+                self.engine = AdaptiveQuizEngine(self.bank, await self.run_db(self.stats.load))
+            else:
+                self.engine = QuizEngine(bank=self.bank, listener=self.stats)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.stats.close()
+        self.bank.save_shared_cache()
+        self.repository.close()
+
+    # Route one request and return (status, payload); used by both the socket
+    # handler and LocalClient. `peer` is the client's address, if known.
+    async def dispatch(self, method, path, payload=None, peer=None):
+        url = urlsplit(path)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            known = any(route_path == url.path for _, route_path in self.routes)
+            status = HTTPStatus.METHOD_NOT_ALLOWED if known else HTTPStatus.NOT_FOUND
+            return status, {"error": status.phrase}
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if isinstance(payload, dict):
+            params.update(payload)
+        # Set here, never taken from the request
+        params["peer"] = peer
+        if time.monotonic() >= self._next_sweep:
+            self.expire_sessions()
+        try:
+            with metrics.timer(f"http.{method} {url.path}"):
+                return await handler(params)
+        except HTTPError as error:
+            return error.status, {"error": error.message}
+        except Exception:
+            # A bug or a database failure: answer, and keep the connection
+            log.exception("%s %s failed", method, url.path)
+            metrics.count("http.error")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error."}
+
+    def session_for(self, params):
+        token = params.get("session")
+        session_id = self.tokens.get(token) if isinstance(token, str) else None
+        session = self.engine.get_session(session_id) if session_id else None
+        if session is None:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Unknown or expired session.")
+        self.last_used[session_id] = time.monotonic()
+        return session
+
+    def drop_session(self, session_id):
+        self.answer_locks.pop(session_id, None)
+        self.last_used.pop(session_id, None)
+        self.engine.end_session(session_id)
+
+    # Forget sessions idle for longer than session_ttl, skipping any with an
+    # answer being graded. Runs from dispatch every tenth of the TTL.
+    def expire_sessions(self):
+        now = time.monotonic()
+        self._next_sweep = now + self.session_ttl / 10
+        expired = 0
+        for token, session_id in list(self.tokens.items()):
+            lock = self.answer_locks.get(session_id)
+            if now - self.last_used.get(session_id, now) > self.session_ttl and not (lock and lock.locked()):
+                del self.tokens[token]
+                self.drop_session(session_id)
+                expired += 1
+        metrics.count("http.sessions_expired", expired)
+        return expired
+
+    async def register(self, params):
+        username, password = params.get("username"), params.get("password")
+        error = validate_credentials(username, password)
+        if error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, error)
+        if not await self.run_db(self.repository.register_user, username, password):
+            raise HTTPError(HTTPStatus.CONFLICT, "Username already exists.")
+        self.throttle.forget(username)
+        return HTTPStatus.CREATED, {"message": "Account created successfully!"}
+
+    async def login(self, params):
+        username, password = params.get("username"), params.get("password")
+        error = validate_credentials(username, password)
+        if error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, error)
+        try:
+            ok = await self.run_db(self.throttle.verify, self.repository.verify_user, username, password,
+                                   params["peer"])
+        except LoginThrottled as error:
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, str(error))
+        if not ok:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Invalid username or password.")
+        # Drawing questions from the bank is a database read as well
+        session = await self.run_db(self.engine.start_session, username)
+        token = secrets.token_urlsafe(16)
+        self.tokens[token] = session.session_id
+        self.answer_locks[session.session_id] = asyncio.Lock()
+        self.last_used[session.session_id] = time.monotonic()
+        return HTTPStatus.OK, {"session": token, "total": session.total}
+
+    async def logout(self, params):
+        session = self.session_for(params)
+        del self.tokens[params["session"]]
+        self.drop_session(session.session_id)
+        return HTTPStatus.OK, {"message": "Logged out."}
+
+    async def question(self, params):
+        session = self.session_for(params)
+        question = session.current_question
+        if question is None:
+            return HTTPStatus.OK, {"finished": True}
+        return HTTPStatus.OK, {
+            "finished": False,
+            "index": session.current_question_index,
+            "total": session.total,
+            "question": question.text,
+            "options": list(question.options),
+        }
+
+    async def answer(self, params):
+        session = self.session_for(params)
+        # Clients may send the option's position ("option_index") or its text
+        option, option_index = params.get("option"), params.get("option_index")
+        if option is None and option_index is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing option.")
+        if option_index is not None:
+            try:
+                option_index = int(option_index)
+            except (TypeError, ValueError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "option_index must be an integer.")
+        async with self.answer_locks[session.session_id]:
+            if session.finished:
+                raise HTTPError(HTTPStatus.CONFLICT, "Quiz already finished.")
+            options = len(session.current_question.options)
+            if option_index is not None and not -1 <= option_index < options:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"option_index must be between -1 and {options - 1}.")
+            # Grading records per-question statistics (and may pick the next
+            # question adaptively), both of which touch the database
+            if option_index is not None:
+                await self.run_db(session.submit_index, option_index)
+            else:
+                await self.run_db(session.submit, option)
+            # Only the request that finished the quiz saves it
+            if session.finished:
+                await self.run_db(self.repository.save_quiz_result, session.username, session.score,
+                                  session.responses)
+        return HTTPStatus.OK, {"finished": session.finished}
+
+    async def results(self, params):
+        session = self.session_for(params)
+        if not session.finished:
+            raise HTTPError(HTTPStatus.CONFLICT, "Quiz not finished yet.")
+        return HTTPStatus.OK, {
+            "score": session.score,
+            "total": session.total,
+            "passed": session.passed,
+            "answers": [
+                {
+                    "question": answer.question.text,
+                    "question_id": answer.question.id,
+                    "selected_option": answer.selected_option,
+                    "correct_answer": answer.correct_answer,
+                    "explanation": answer.explanation,
+                }
+                for answer in session.user_answers
+            ],
+        }
+
+    # Prometheus text for scraping; empty unless metrics are enabled
+    async def metrics(self, params):
+        return HTTPStatus.OK, metrics.to_prometheus()
+
+    # Minimal HTTP/1.1 connection handler with keep-alive
+    async def handle_connection(self, reader, writer):
+        address = writer.get_extra_info("peername")
+        peer = address[0] if isinstance(address, tuple) else None
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.write_response(writer, HTTPStatus.BAD_REQUEST, {"error": "Bad request line."}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.write_response(writer, HTTPStatus.BAD_REQUEST, {"error": "Bad Content-Length."}, False)
+                    break
+                if length > MAX_BODY:
+                    await self.write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large."}, False)
+                    break
+                payload = None
+                if length:
+                    try:
+                        payload = json.loads(await reader.readexactly(length))
+                    except ValueError:
+                        await self.write_response(writer, HTTPStatus.BAD_REQUEST, {"error": "Invalid JSON body."}, keep_alive)
+                        continue
+
+                status, body = await self.dispatch(method, target, payload, peer)
+                await self.write_response(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response(self, writer, status, body, keep_alive):
+        if isinstance(body, str):
+            data, content_type = body.encode(), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(body).encode(), "application/json"
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        await self.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+# In-process client that calls the server's router directly, for tests and
+# benchmarks that must not touch the network
+class LocalClient:
+    def __init__(self, server, peer=None):
+        self.server = server
+        self.peer = peer
+
+    async def request(self, method, path, payload=None):
+        status, body = await self.server.dispatch(method, path, json.loads(json.dumps(payload)), self.peer)
+        return int(status), body
+
+    async def get(self, path):
+        return await self.request("GET", path)
+
+    async def post(self, path, payload=None):
+        return await self.request("POST", path, payload)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the quiz over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--db-workers", type=int, default=4, help="threads used for database calls and password checks")
+    parser.add_argument("--password-cost", default=DEFAULT_COST, choices=sorted(COST_LEVELS))
+    parser.add_argument("--adaptive", action="store_true", help="pick each question to match the learner's ability")
+    parser.add_argument("--session-ttl", type=float, default=SESSION_TTL,
+                        help="seconds before an unused session is dropped")
+    parser.add_argument("--metrics", metavar="FILE", help="collect timings, serve them on /metrics and write FILE on exit")
+    parser.add_argument("--profile", metavar="FILE", help="run cProfile and write its stats to FILE on exit")
+    args = parser.parse_args(argv)
+    if args.metrics or args.profile:
+        metrics.enable(args.metrics, args.profile)
+
+    repository = QuizRepository(args.db, pool_size=args.db_workers, hasher=PasswordHasher.from_level(args.password_cost))
+    server = QuizServer(repository, db_workers=args.db_workers, adaptive=args.adaptive, session_ttl=args.session_ttl)
+    logging.basicConfig(level=logging.INFO)
+    print(f"Serving quiz on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+
+from adaptive import QuestionStats
+from database import QuizRepository
+from question_bank import QuestionBank
+
+SHARD_DIR = os.environ.get("QUIZ_SHARD_DIR", "shards")
+
+
+# Spreads users over several SQLite files so writers for different shards
+# never wait on the same lock. A user's tenant (school, class, organisation)
+# picks the file <directory>/<tenant>.db; users without a tenant are placed by
+# a stable hash of the username in <directory>/shard-NN.db. Each file is a
+# complete quiz database, created and migrated the first time it is opened
+# for writing. Questions and their statistics are read from the primary shard.
+class ShardRouter:
+    def __init__(self, directory=SHARD_DIR, shards=1, tenant=None, **options):
+        if shards < 1:
+            raise ValueError("need at least one shard")
+        self.directory = directory
+        self.shards = shards
+        # Tenant used when a call does not name one, e.g. one school per machine
+        self.tenant = self.check_tenant(tenant) if tenant else None
+        # Passed on to every QuizRepository (hasher, pool_size, timeout, ...)
+        self.options = options
+        self._repositories = {}
+        # Opened only to be read: no directory, schema or seed questions
+        self._existing = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def check_tenant(tenant):
+        # Tenant names become file names
+        if not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9_.-]*", tenant):
+            raise ValueError(f"invalid tenant name: {tenant!r}")
+        return tenant
+
+    # crc32 rather than hash(), which changes between runs
+    def shard_key(self, username, tenant=None):
+        tenant = tenant or self.tenant
+        if tenant:
+            return self.check_tenant(tenant)
+        return f"shard-{zlib.crc32(username.encode()) % self.shards:02d}"
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.db")
+
+    def _open(self, key):
+        with self._lock:
+            repository = self._repositories.get(key)
+            if repository is None:
+                os.makedirs(self.directory, exist_ok=True)
+                repository = QuizRepository(self.path(key), **self.options)
+                repository.init_schema()
+                QuestionBank(repository).init_schema()
+                QuestionStats(repository).init_schema()
+                self._repositories[key] = repository
+            return repository
+
+    # An existing database to read from, without creating, migrating or
+    # seeding it (that is left to the write paths); None if there is no file
+    def _open_existing(self, key):
+        with self._lock:
+            repository = self._repositories.get(key) or self._existing.get(key)
+            if repository is None:
+                if not os.path.exists(self.path(key)):
+                    return None
+                repository = QuizRepository(self.path(key), **self.options)
+                self._existing[key] = repository
+            return repository
+
+    # One result journal per tenant, or one for all hash shards
+    @property
+    def journal_path(self):
+        return os.path.join(self.directory, f"{self.tenant or 'shards'}.journal")
+
+    # Checkpoints per tenant, or one directory for all hash shards (each
+    # username lives on exactly one of them)
+    @property
+    def checkpoint_dir(self):
+        return os.path.join(self.directory, f"{self.tenant or 'shards'}.sessions")
+
+    def repository(self, username, tenant=None):
+        return self._open(self.shard_key(username, tenant))
+
+    def existing_repository(self, username, tenant=None):
+        return self._open_existing(self.shard_key(username, tenant))
+
+    @property
+    def primary(self):
+        return self._open(self.tenant or "shard-00")
+
+    # The databases this router writes to: its tenant's file, or every hash
+    # shard. Other tenants' files are left alone.
+    def repositories(self):
+        if self.tenant:
+            return [self.primary]
+        return [self._open(f"shard-{i:02d}") for i in range(self.shards)]
+
+    # Every existing database in the directory, whichever tenant or shard it
+    # belongs to, opened for reading only; for reports across all of them
+    def all_repositories(self):
+        if not os.path.isdir(self.directory):
+            return []
+        keys = sorted(name[:-3] for name in os.listdir(self.directory) if name.endswith(".db"))
+        return [repository for repository in map(self._open_existing, keys) if repository is not None]
+
+    def init_schema(self):
+        return self.repositories()
+
+    def register_user(self, username, password, tenant=None):
+        return self.repository(username, tenant).register_user(username, password)
+
+    def verify_user(self, username, password, tenant=None):
+        return self.repository(username, tenant).verify_user(username, password)
+
+    def save_quiz_result(self, username, score, responses=None, tenant=None):
+        return self.repository(username, tenant).save_quiz_result(username, score, responses)
+
+    # ResultBuffer batches: split by shard, one transaction per shard. A
+    # shard that fails raises; the buffer retries the batch and the shards
+    # that already committed skip the rows they have.
+    def save_journaled_results(self, rows):
+        by_shard = defaultdict(list)
+        for row in rows:
+            by_shard[self.shard_key(row[0])].append(row)
+        return sum(self._open(key).save_journaled_results(shard_rows) for key, shard_rows in by_shard.items())
+
+    def close(self):
+        with self._lock:
+            repositories = list(self._repositories.values()) + list(self._existing.values())
+            self._repositories, self._existing = {}, {}
+        for repository in repositories:
+            repository.close()